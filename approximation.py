@@ -1,42 +1,44 @@
 import random
-import matplotlib.pyplot as plt
 import networkx as nx
-from steinlib.instance import SteinlibInstance
-from steinlib.parser import SteinlibParser
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from csr_graph import minimum_spanning_edges
+from loader import load_instance
+from postprocess import clean_solution
+from shortest_path import get_oracle
+from solution import get_indexed_graph
 
 # stein_file = "data/test.std"
 stein_file = "data/B/b02.stp"
 
 
-# draw a graph in a window
-def print_graph(graph, terms=None, sol=None, index=1):
-    pos = nx.kamada_kawai_layout(graph)
-    plt.figure(index)
-    nx.draw(graph, pos, with_labels=True)
-    if (not (terms is None)):
-        nx.draw_networkx_nodes(graph, pos, nodelist=terms, node_color='r')
-    if (not (sol is None)):
-        nx.draw_networkx_edges(graph, pos, edgelist=sol, edge_color='r')
-    plt.show()
-    return
+# draw a graph in a window, or in the file path
+def print_graph(graph, terms=None, sol=None, index=1, path=None):
+    from visualization import draw_solution
+    draw_solution(graph, terms, sol, path, index=index)
 
 
-# verify if a solution is correct and evaluate it
-def eval_sol(graph, terms, sol, verif_tree=False):
+# verify if a solution is correct and evaluate it, graph is a nx.Graph() or a CSRGraph,
+# return -1 if it is not, with an error message if verbose
+def eval_sol(graph, terms, sol, verif_tree=False, verbose=True):
+    indexed = get_indexed_graph(graph)
     graph_sol = nx.Graph()
     for (i, j) in sol:
-        graph_sol.add_edge(i, j, weight=graph[i][j]['weight'])
+        graph_sol.add_edge(i, j, weight=indexed.edge_weight[indexed.edge_id((i, j))])
 
     # is sol a tree
     if verif_tree:
         if (not (nx.is_tree(graph_sol))):
-            print("Error: the proposed solution is not a tree")
+            if verbose:
+                print("Error: the proposed solution is not a tree")
             return -1
 
     # are the terminals covered
     for i in terms:
         if not i in graph_sol:
-            print("Error: a terminal is missing from the solution")
+            if verbose:
+                print("Error: a terminal is missing from the solution")
             return -1
 
     # cost of solution
@@ -45,71 +47,108 @@ def eval_sol(graph, terms, sol, verif_tree=False):
     return int(cost)
 
 
-def approx_steiner(graph, terms):
+def metric_closure(graph, terms, oracle=None):
+    """
+    the matrix of the length of the shortest paths between the terms, closure[k][l] for terms[k] and terms[l]
+    only one dijkstra per terminal is run (one scipy call for the missing rows), the paths are not built
+    """
+    if oracle is None:
+        oracle = get_oracle(graph)
+    columns = [oracle.indexed.index[node] for node in terms]
+    return np.array([dist[columns] for (_, dist) in oracle.rows(terms)])
+
+
+def approx_steiner(graph, terms, oracle=None, post_process=False, closure=None):
     """
     compute a approximate solution to the steiner problem
-    Graph: graph e.g. Graph with 7 nodes and 9 edges
+    Graph: graph e.g. Graph with 7 nodes and 9 edges, or CSRGraph
     List: terms e.g. [1,3,5,7]
-    Dict: len_path
+    ShortestPathOracle: oracle, shortest paths of the graph, the shared one of the graph by default
             e.g.
-                len_path[number of vertex][distance or path][number of vertex]
-                len_path[e[0]][0][e[1]]
-                {1:({1:0, 2:1,...,5:2}, {1:[1], 2:[1,2],...,5:[1,4,5]}),
-                2:({2:0, 1:1,...
-                ...
-                7}
-            and we have int: weight = len_path[e[0]][0][e[1]],
-                (int, int): edge = (len_path[e[0]][1][e[1]][i], len_path[e[0]][1][e[1]][i + 1])
+                int: weight = oracle.distance(e[0], e[1])
+                list: path = oracle.path(e[0], e[1]), e.g. [1, 4, 5]
+                (int, int): edge = (path[i], path[i + 1])
+    bool: post_process, clean the solution with postprocess.clean_solution
+    closure: metric_closure(graph, terms) if it is already known, e.g. from a SolutionCache
 
     """
-    # Find the shortest weighted paths of the original graph
-    len_path = dict(nx.all_pairs_dijkstra(graph))
-    # print(len_path)
-    # The complete graph of terminals
-    comp_graph = nx.complete_graph(terms)
-    # Add weight to the edges
-    for e in comp_graph.edges:
-        comp_graph[e[0]][e[1]]['weight'] = len_path[e[0]][0][e[1]]
+    # Find the shortest weighted paths from the terminals only
+    if oracle is None:
+        oracle = get_oracle(graph)
+    # The complete graph of terminals, weighted by the shortest paths
+    if closure is None:
+        closure = metric_closure(graph, terms, oracle)
+    first, second = np.triu_indices(len(terms), 1)
     # The minimum spanning tree of the complete graph
-    min_span_tree = nx.minimum_spanning_tree(comp_graph)
-    # print(min_span_tree.edges)
+    tree_edges = minimum_spanning_edges(len(terms), first, second, closure[first, second])
     res = []
-    # path to edges
-    for e in min_span_tree.edges:
-        for i in range(len(len_path[e[0]][1][e[1]]) - 1):
-            res.append((len_path[e[0]][1][e[1]][i],
-                        len_path[e[0]][1][e[1]][i + 1]))
+    # path to edges, only the paths of the tree are rebuilt
+    for k in tree_edges.tolist():
+        path = oracle.path(terms[first[k]], terms[second[k]])
+        for i in range(len(path) - 1):
+            res.append((path[i], path[i + 1]))
     # remove the duplicate
     res = list(set(res))
+    if post_process:
+        res = clean_solution(graph, terms, res)
     # return a list of edges
-    # print(res)
     return res
 
 
-# class used to read a steinlib instance
-class MySteinlibInstance(SteinlibInstance):
-    my_graph = nx.Graph()
-    terms = []
+def mehlhorn_steiner(graph, terms, post_process=False):
+    """
+    compute a approximate solution to the steiner problem with the algorithm of Mehlhorn,
+    same guarantee as approx_steiner but in O(E + V log V)
+    Graph: graph e.g. Graph with 7 nodes and 9 edges, or CSRGraph
+    List: terms e.g. [1,3,5,7]
+    One dijkstra from all the terminals at once gives the voronoi region of every terminal
+    (base[node] is its closest terminal). An edge (u, v) between two regions gives a path
+    base[u] ~ u - v ~ base[v] of length dist[u] + weight + dist[v]. The minimum spanning tree
+    of the terminals with these boundary edges is a minimum spanning tree of the metric closure.
+    bool: post_process, clean the solution with postprocess.clean_solution
+    """
+    indexed = get_indexed_graph(graph)
+    # multi source dijkstra from the terminals
+    dist, pred, base = dijkstra(indexed.matrix, directed=False, indices=[indexed.index[node] for node in terms],
+                                return_predecessors=True, min_only=True)
+
+    # the boundary edges between two regions
+    u, v, weight = indexed.arrays()
+    boundary = np.flatnonzero((base[u] != base[v]) & (base[u] >= 0) & (base[v] >= 0))
+    length = dist[u[boundary]] + weight[boundary] + dist[v[boundary]]
+
+    # The minimum spanning tree of the terminals with the boundary edges
+    region = {node: k for k, node in enumerate(np.unique(base[base >= 0]).tolist())}
+    region_u = [region[i] for i in base[u[boundary]].tolist()]
+    region_v = [region[i] for i in base[v[boundary]].tolist()]
+    tree_edges = boundary[minimum_spanning_edges(len(region), region_u, region_v, length)]
+
+    res = []
+    labels = indexed.labels
+    # boundary edge and the paths to the terminals of its regions
+    for edge_id in tree_edges.tolist():
+        res.append(indexed.edge_labels(edge_id))
+        for node in (indexed.edge_u[edge_id], indexed.edge_v[edge_id]):
+            while pred[node] >= 0:
+                res.append((labels[pred[node]], labels[node]))
+                node = pred[node]
+    # remove the duplicate
+    res = list(set(res))
+    if post_process:
+        res = clean_solution(graph, terms, res)
+    return res
 
-    def terminals__t(self, line, converted_token):
-        self.terms.append(converted_token[0])
 
-    def graph__e(self, line, converted_token):
-        e_start = converted_token[0]
-        e_end = converted_token[1]
-        weight = converted_token[2]
-        # print ("weight: " + str(weight))
-        self.my_graph.add_edge(e_start, e_end, weight=weight)
+# the approximation algorithms, name -> function(graph, terms, post_process=False) returning a list of edges
+APPROX_METHODS = {
+    "approx": approx_steiner,
+    "mehlhorn": mehlhorn_steiner,
+}
 
 
 if __name__ == "__main__":
-    my_class = MySteinlibInstance()
-    with open(stein_file) as my_file:
-        my_parser = SteinlibParser(my_file, my_class)
-        my_parser.parse()
-        my_terms = my_class.terms
-        my_graph = my_class.my_graph
-
-        my_sol = approx_steiner(my_graph, my_terms)
-        print_graph(my_graph, my_terms, my_sol)
-        print(eval_sol(my_graph, my_terms, my_sol))
+    my_graph, my_terms = load_instance(stein_file)
+
+    my_sol = approx_steiner(my_graph, my_terms)
+    print_graph(my_graph, my_terms, my_sol)
+    print(eval_sol(my_graph, my_terms, my_sol))
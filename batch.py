@@ -0,0 +1,245 @@
+import argparse
+import glob
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from approximation import APPROX_METHODS, eval_sol
+from exact import dreyfus_wagner
+from loader import load_instance
+from local_search import local_search
+from postprocess import clean_solution
+from profiler import Profile
+from reduction import reduce_instance
+from schedule import SCHEDULES, get_schedule
+from simulated_annealing import annealing, get_sol_list
+from solution_cache import SolutionCache
+from state import State
+from tempering import parallel_tempering, temperature_ladder
+
+METHODS = list(APPROX_METHODS) + ["annealing", "tempering", "exact"]
+
+
+def solve_instance(stein_file: str, method: str, times: int = 3000, temperature: float = 30.0,
+                   speed: float = 0.01, node_method: bool = True, init: str = "approx", seed: int = 0,
+                   post_process: bool = False, schedule: str = "linear", patience: int = None,
+                   batch: int = None, cache: str = None, reduce: bool = False, improve: bool = False,
+                   profile: bool = False, replicas: int = 8, cold: float = 0.5):
+    """
+    solve one steinlib file with a method ("approx", "mehlhorn", "annealing", "tempering" or "exact")
+    init: initial solution of the annealing, "approx", "mehlhorn", "all" the edges,
+        or "best" the best solution of the cache ("approx" if there is none)
+    post_process: clean the final solution with postprocess.clean_solution
+    schedule: cooling schedule of the annealing, a name of schedule.SCHEDULES
+    patience: stop the annealing when the best score is not improved during patience iterations
+    batch: number of edge flips drawn at every annealing iteration, only with the edge method
+    cache: directory of a SolutionCache, the approximations are read from it and the annealing solutions offered to it
+    reduce: solve the instance reduced by reduction.reduce_instance, the solution is expanded back to the original graph
+    improve: run local_search.local_search on the solution of the approximation or of the annealing
+    profile: add the profiler.Profile of the annealing to the record
+    replicas, cold: the tempering runs replicas states at temperatures from cold to temperature,
+        times / 100 sweeps of 100 iterations per replica
+    return the record of the run: cost, score, time and iterations
+    """
+    random.seed(seed)
+    original_graph, original_terms = load_instance(stein_file)
+    solution_cache = SolutionCache(cache) if cache is not None else None
+    start = time.time()
+    reduction = reduce_instance(original_graph, original_terms) if reduce else None
+    graph, terms = (reduction.graph, reduction.terms) if reduce else (original_graph, original_terms)
+    if method in APPROX_METHODS:
+        if solution_cache is not None:
+            sol = solution_cache.approx(graph, terms, method)
+            if post_process:
+                sol = clean_solution(graph, terms, sol)
+        else:
+            sol = APPROX_METHODS[method](graph, terms, post_process=post_process)
+        if improve:
+            sol = local_search(graph, terms, sol)
+        score = None
+        iterations = 0
+    elif method in ("annealing", "tempering"):
+        init_sol = initial_solution(graph, terms, init, solution_cache)
+        if method == "annealing":
+            state = State(graph, terms, init_sol, temperature, speed)
+            state_profile = Profile() if profile else None
+            state, points_x, _ = annealing(state, times, node_method, schedule=get_schedule(schedule, speed),
+                                           patience=patience, batch=batch, profile=state_profile)
+            iterations = points_x[-1] + 1 if points_x else 0
+        else:
+            sweeps = max(times // 100, 1)
+            state, statistics = parallel_tempering(graph, terms, temperature_ladder(cold, temperature, replicas),
+                                                   sweeps, 100, node_method, init_sol, seed=seed, batch=batch)
+            iterations = sweeps * 100 * replicas
+        if post_process:
+            state.clean()
+        if improve and state.number_not_covered_terminals == 0 and state.number_components == 0:
+            state.improve()
+        sol = state.sol
+        score = state.score
+        if solution_cache is not None and state.number_not_covered_terminals == 0 and state.number_components == 0:
+            solution_cache.offer(graph, terms, sol, score)
+    elif method == "exact":
+        # a ValueError if the instance is too large, written as an error record
+        sol = dreyfus_wagner(graph, terms)
+        score = None
+        iterations = 0
+    else:
+        raise ValueError("unknown method " + str(method))
+    if reduce:
+        sol = reduction.expand(sol)
+        if score is not None:
+            score += reduction.fixed_weight
+    elapsed = time.time() - start
+    # -1 if a terminal is missing, without a message from the worker processes
+    cost = eval_sol(original_graph, original_terms, sol, verbose=False)
+    record = {
+        "instance": os.path.normpath(stein_file),
+        "method": method,
+        "nodes": original_graph.number_of_nodes(),
+        "edges": original_graph.number_of_edges(),
+        "terminals": len(original_terms),
+        "cost": cost,
+        "score": cost if score is None else score,
+        "time": elapsed,
+        "iterations": iterations,
+        "seed": seed,
+    }
+    if method == "annealing" and profile:
+        record["profile"] = state_profile.as_dict()
+    if method == "tempering":
+        record["swap_rates"] = statistics["swap_rates"]
+    if reduce:
+        record["reduced_nodes"] = graph.number_of_nodes()
+        record["reduced_edges"] = graph.number_of_edges()
+    return record
+
+
+def initial_solution(graph, terms: [], init: str, solution_cache=None):
+    """
+    return the initial solution of the annealing, see the init option of solve_instance
+    """
+    if init == "best" and solution_cache is not None:
+        sol, _ = solution_cache.best(graph, terms)
+        if sol is not None:
+            return sol
+    if init == "best":
+        init = "approx"
+    if init in APPROX_METHODS:
+        if solution_cache is not None:
+            return solution_cache.approx(graph, terms, init)
+        return APPROX_METHODS[init](graph, terms)
+    return get_sol_list(graph)
+
+
+def read_done(output: str):
+    """
+    return the set of (instance, method) already in the output file
+    """
+    done = set()
+    if not os.path.exists(output):
+        return done
+    with open(output) as output_file:
+        for line in output_file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a line cut by an interrupted run
+                continue
+            if "error" not in record:
+                done.add((record["instance"], record["method"]))
+    return done
+
+
+def run_batch(pattern: str, methods: [], output: str, workers: int = 1, **options):
+    """
+    solve every steinlib file matching the glob pattern with every method
+    one json record per line is appended to output as soon as an instance is solved,
+    the (instance, method) already in output are skipped
+    return the number of solved runs
+    """
+    done = read_done(output)
+    tasks = []
+    for stein_file in sorted(glob.glob(pattern)):
+        for method in methods:
+            if (os.path.normpath(stein_file), method) not in done:
+                tasks.append((stein_file, method))
+
+    with open(output, "a") as output_file:
+        def write(record):
+            output_file.write(json.dumps(record) + "\n")
+            output_file.flush()
+
+        if workers <= 1:
+            for stein_file, method in tasks:
+                write(_solve_or_error(stein_file, method, options))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_solve_or_error, stein_file, method, options)
+                           for stein_file, method in tasks]
+                for future in as_completed(futures):
+                    write(future.result())
+    return len(tasks)
+
+
+def _solve_or_error(stein_file, method, options):
+    try:
+        return solve_instance(stein_file, method, **options)
+    except Exception as error:
+        return {"instance": os.path.normpath(stein_file), "method": method, "error": repr(error)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a batch of steinlib instances without display")
+    parser.add_argument("pattern", help="glob of .stp files, e.g. 'data/B/*.stp'")
+    parser.add_argument("-m", "--method", action="append", choices=METHODS,
+                        help="method to run, can be repeated (default: approx)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="jsonl file, runs already in it are skipped")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--times", type=int, default=3000, help="annealing iterations")
+    parser.add_argument("--temperature", type=float, default=30.0, help="annealing start temperature")
+    parser.add_argument("--speed", type=float, default=0.01, help="annealing temperature decrease per iteration")
+    parser.add_argument("--schedule", choices=list(SCHEDULES), default="linear", help="annealing cooling schedule")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="stop the annealing when the best score is not improved during this many iterations")
+    parser.add_argument("--batch", type=int, default=None,
+                        help="with --edge-method, draw this many edge flips at every iteration and keep at most one")
+    parser.add_argument("--edge-method", action="store_true", help="use the edge moves instead of the node moves")
+    parser.add_argument("--init", choices=list(APPROX_METHODS) + ["all", "best"], default="approx",
+                        help="initial annealing solution: approx_steiner, mehlhorn_steiner, all the edges "
+                             "or the best solution of the cache")
+    parser.add_argument("--cache", default=None,
+                        help="directory of the solution cache (approximations and best annealing solutions)")
+    parser.add_argument("--local-search", action="store_true",
+                        help="improve the solutions with vertex elimination, vertex insertion and key path exchange")
+    parser.add_argument("--profile", action="store_true",
+                        help="add the calls and times of the state operations of the annealing to the records")
+    parser.add_argument("--reduce", action="store_true",
+                        help="solve the instance reduced by the degree and long edge tests")
+    parser.add_argument("--replicas", type=int, default=8, help="number of tempering replicas")
+    parser.add_argument("--cold", type=float, default=0.5, help="temperature of the coldest tempering replica")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--post-process", action="store_true",
+                        help="clean the solutions: MST of the selected nodes and pruning of the non-terminal leaves")
+    args = parser.parse_args(argv)
+    if args.batch is not None and not args.edge_method:
+        parser.error("--batch needs --edge-method, the batch proposals are edge flips")
+    if "tempering" in (args.method or []) and not 0.0 < args.cold < args.temperature:
+        parser.error("the tempering needs 0 < --cold < --temperature")
+
+    number = run_batch(args.pattern, args.method or ["approx"], args.output, args.workers,
+                       times=args.times, temperature=args.temperature, speed=args.speed,
+                       node_method=not args.edge_method, init=args.init, seed=args.seed,
+                       post_process=args.post_process, schedule=args.schedule, patience=args.patience,
+                       batch=args.batch, cache=args.cache, reduce=args.reduce,
+                       improve=args.local_search, profile=args.profile, replicas=args.replicas, cold=args.cold)
+    print(str(number) + " runs written to " + args.output)
+
+
+if __name__ == "__main__":
+    main()
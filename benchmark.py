@@ -0,0 +1,190 @@
+import argparse
+import glob
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from approximation import approx_steiner, eval_sol, metric_closure
+from csr_graph import minimum_spanning_edges
+from loader import load_instance
+from shortest_path import ShortestPathOracle
+from simulated_annealing import annealing
+from state import State
+
+# optimal values of the Beasley instances of steinlib
+OPTIMA = {
+    "b01": 82, "b02": 83, "b03": 138, "b04": 59, "b05": 61, "b06": 122,
+    "b07": 111, "b08": 104, "b09": 220, "b10": 86, "b11": 88, "b12": 174,
+    "b13": 165, "b14": 235, "b15": 318, "b16": 127, "b17": 131, "b18": 218,
+    "c01": 85, "c02": 144, "c03": 754, "c04": 1079, "c05": 1579, "c06": 55,
+    "c07": 102, "c08": 509, "c09": 707, "c10": 1093, "c11": 32, "c12": 46,
+    "c13": 258, "c14": 323, "c15": 556, "c16": 11, "c17": 18, "c18": 113,
+    "c19": 146, "c20": 267,
+}
+
+# metric -> True if a higher value is better
+METRICS = {
+    "parse_time": False,
+    "cache_load_time": False,
+    "apsp_time": False,
+    "mst_time": False,
+    "approx_time": False,
+    "approx_gap": False,
+    "annealing_iterations_per_sec": True,
+    "score_time": False,
+    "annealing_gap": False,
+}
+
+
+def instance_name(stein_file: str):
+    return os.path.splitext(os.path.basename(stein_file))[0]
+
+
+def gap(cost, optimum):
+    """
+    relative distance of a cost to the optimum, None if the optimum is unknown or the solution invalid
+    """
+    if optimum is None or cost < 0:
+        return None
+    return (cost - optimum) / optimum
+
+
+def benchmark_instance(stein_file: str, times: int = 3000, score_calls: int = 1000, seed: int = 0):
+    """
+    run every phase of the solvers on one instance and time it
+    return the record of the instance
+    """
+    random.seed(seed)
+    name = instance_name(stein_file)
+    optimum = OPTIMA.get(name)
+    record = {"instance": name, "optimum": optimum}
+
+    # the parse of the text file, without the binary cache of the loader
+    start = time.perf_counter()
+    load_instance(stein_file, use_cache=False)
+    record["parse_time"] = time.perf_counter() - start
+    # the load from the binary cache, written by the first call if it is missing or stale
+    load_instance(stein_file)
+    start = time.perf_counter()
+    graph, terms = load_instance(stein_file)
+    record["cache_load_time"] = time.perf_counter() - start
+
+    # shortest paths from every terminal, with a fresh oracle
+    oracle = ShortestPathOracle(graph, max_rows=None)
+    start = time.perf_counter()
+    for node in terms:
+        oracle.row(node)
+    record["apsp_time"] = time.perf_counter() - start
+
+    # minimum spanning tree of the complete graph of terminals
+    closure = metric_closure(graph, terms, oracle)
+    first, second = np.triu_indices(len(terms), 1)
+    start = time.perf_counter()
+    minimum_spanning_edges(len(terms), first, second, closure[first, second])
+    record["mst_time"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sol = approx_steiner(graph, terms, ShortestPathOracle(graph))
+    record["approx_time"] = time.perf_counter() - start
+    record["approx_cost"] = eval_sol(graph, terms, sol)
+    record["approx_gap"] = gap(record["approx_cost"], optimum)
+
+    state = State(graph, terms, sol, temperature=30.0, speed=0.01)
+    start = time.perf_counter()
+    state, _, _ = annealing(state, times)
+    elapsed = time.perf_counter() - start
+    record["annealing_iterations_per_sec"] = times / elapsed if elapsed > 0 else None
+    record["annealing_cost"] = eval_sol(graph, terms, state.sol)
+    record["annealing_gap"] = gap(record["annealing_cost"], optimum)
+
+    # score_calls evaluations of the score, each one after a move which is not timed
+    score_time = 0.0
+    for _ in range(score_calls):
+        delta = state.random_edge_action()
+        start = time.perf_counter()
+        state.score
+        score_time += time.perf_counter() - start
+        state.revert(delta)
+    record["score_time"] = score_time
+    return record
+
+
+def compare(records: [], baseline: {}, time_tolerance: float = 0.25, gap_tolerance: float = 0.0,
+            time_floor: float = 0.001):
+    """
+    compare the records to a baseline (instance -> record)
+    return the list of regressions (instance, metric, baseline value, new value)
+    the times can be time_tolerance (relative) worse, the gaps gap_tolerance (absolute) worse,
+    the times shorter than time_floor seconds are too noisy and never regress
+    """
+    regressions = []
+    for record in records:
+        base = baseline.get(record["instance"])
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old = base.get(metric)
+            new = record.get(metric)
+            if old is None or new is None:
+                continue
+            if metric.endswith("_gap"):
+                worse = new > old + gap_tolerance
+            elif higher_is_better:
+                worse = new < old * (1 - time_tolerance)
+            else:
+                worse = new > old * (1 + time_tolerance) and new > time_floor
+            if worse:
+                regressions.append((record["instance"], metric, old, new))
+    return regressions
+
+
+def print_table(records: []):
+    columns = ["instance", "parse_time", "cache_load_time", "apsp_time", "mst_time", "approx_time", "approx_gap",
+               "annealing_iterations_per_sec", "score_time", "annealing_gap"]
+    print(" ".join(column.rjust(12)[:12] if i > 0 else column.ljust(8) for i, column in enumerate(columns)))
+    for record in records:
+        cells = [record["instance"].ljust(8)]
+        for column in columns[1:]:
+            value = record.get(column)
+            cells.append(("-" if value is None else "%.4g" % value).rjust(12))
+        print(" ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solvers on the steinlib B and C instances")
+    parser.add_argument("patterns", nargs="*", default=["data/B/*.stp", "data/C/*.stp"])
+    parser.add_argument("--times", type=int, default=3000, help="annealing iterations")
+    parser.add_argument("--score-calls", type=int, default=1000,
+                        help="number of score evaluations, score_time is their total time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="json file of a previous run to compare with")
+    parser.add_argument("--save", help="write the records to this json file, e.g. to make a new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25)
+    parser.add_argument("--gap-tolerance", type=float, default=0.0)
+    parser.add_argument("--time-floor", type=float, default=0.001)
+    args = parser.parse_args(argv)
+
+    stein_files = sorted(stein_file for pattern in args.patterns for stein_file in glob.glob(pattern))
+    records = [benchmark_instance(stein_file, args.times, args.score_calls, args.seed) for stein_file in stein_files]
+    print_table(records)
+
+    if args.save:
+        with open(args.save, "w") as save_file:
+            json.dump({record["instance"]: record for record in records}, save_file, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(records, baseline, args.time_tolerance, args.gap_tolerance, args.time_floor)
+        for instance, metric, old, new in regressions:
+            print("REGRESSION " + instance + " " + metric + ": " + str(old) + " -> " + str(new))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+from array import array
+
+
+class Connectivity(object):
+    """
+    This class tracks the connected components of the selected edges of a Solution.
+    An added edge is a union of a union-find. A removed edge which can split its component
+    runs two searches, one from each end, in turn: the search which ends first has found the
+    smaller side, only this side gets new union-find elements.
+    A node which leaves the solution keeps its old element (the other nodes can still go
+    through it to their root) and takes a new element when it is selected again.
+    """
+
+    def __init__(self, solution):
+        """
+        solution: the Solution, add_edge and remove_edge are called after its add and remove
+        """
+        self.solution = solution
+        self.number = 0
+        self._element = array('i', [-1]) * solution.indexed.number_nodes
+        self._parent = array('i')
+        self._rebuild()
+
+    def __repr__(self):
+        return "Connectivity(components: " + str(self.number) + ")"
+
+    def connected(self, u: int, v: int) -> bool:
+        """
+        return True if the selected nodes u and v are in the same component
+        """
+        return self._find(self._element[u]) == self._find(self._element[v])
+
+    def add_edge(self, u: int, v: int):
+        """
+        update the components after the edge (u, v) was added to the solution
+        """
+        degree = self.solution.degree
+        if degree[u] == 1:
+            self._element[u] = self._new_element()
+        if degree[v] == 1:
+            self._element[v] = self._new_element()
+        if degree[u] == 1 and degree[v] == 1:
+            # a new component of one edge
+            self.number += 1
+        elif degree[u] > 1 and degree[v] > 1:
+            if self._union(self._element[u], self._element[v]):
+                # the edge merges two components
+                self.number -= 1
+            return
+        self._union(self._element[u], self._element[v])
+
+    def remove_edge(self, u: int, v: int):
+        """
+        update the components after the edge (u, v) was removed from the solution
+        """
+        degree = self.solution.degree
+        if degree[u] == 0 and degree[v] == 0:
+            # a component of one edge disappears
+            self.number -= 1
+        elif degree[u] > 0 and degree[v] > 0:
+            side = self._separated_side(u, v)
+            if side is not None:
+                # the component is split, the smaller side gets new elements
+                self.number += 1
+                root = self._new_element()
+                for node in side:
+                    self._element[node] = root
+        # else a leaf is removed, the component stays connected
+
+        if len(self._parent) > 4 * len(self._element) + 64:
+            self._rebuild()
+
+    def _separated_side(self, u: int, v: int):
+        """
+        search from u and from v in turn over the selected edges
+        return the nodes of the side which is separated from the other one, or None if u and v are connected
+        """
+        solution = self.solution
+        other_end = solution.indexed.other_end
+        visited = ({u}, {v})
+        stacks = ([u], [v])
+        while True:
+            for side in (0, 1):
+                if not stacks[side]:
+                    return visited[side]
+                node = stacks[side].pop()
+                for edge_id in solution.selected_incident(node):
+                    neighbor = other_end(edge_id, node)
+                    if neighbor in visited[1 - side]:
+                        return None
+                    if neighbor not in visited[side]:
+                        visited[side].add(neighbor)
+                        stacks[side].append(neighbor)
+
+    def _new_element(self):
+        element = len(self._parent)
+        self._parent.append(element)
+        return element
+
+    def _find(self, element: int):
+        parent = self._parent
+        while parent[element] != element:
+            # path halving
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+        return element
+
+    def _union(self, element1: int, element2: int) -> bool:
+        root1 = self._find(element1)
+        root2 = self._find(element2)
+        if root1 == root2:
+            return False
+        self._parent[root2] = root1
+        return True
+
+    def _rebuild(self):
+        """
+        start again from the selected edges, to drop the elements of the old nodes
+        """
+        solution = self.solution
+        self._parent = array('i')
+        self.number = 0
+        for node in range(len(self._element)):
+            self._element[node] = -1
+        for node in solution.selected_nodes:
+            self._element[node] = self._new_element()
+            self.number += 1
+        for edge_id in solution.selected_edges:
+            if self._union(self._element[solution.indexed.edge_u[edge_id]],
+                           self._element[solution.indexed.edge_v[edge_id]]):
+                self.number -= 1
@@ -0,0 +1,158 @@
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra, minimum_spanning_tree
+
+
+def _compact_weight(weight):
+    """
+    return the weights as int32 if they fit in it, else int64 (float64 above the range of int64),
+    float64 for the other types
+    """
+    if not np.issubdtype(weight.dtype, np.integer):
+        return weight.astype(np.float64)
+    if len(weight) == 0:
+        return weight.astype(np.int32)
+    low, high = int(weight.min()), int(weight.max())
+    for dtype in (np.int32, np.int64):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return weight.astype(dtype)
+    return weight.astype(np.float64)
+
+
+class CSRGraph(object):
+    """
+    This class is a compact undirected graph: the adjacency is a CSR matrix with int32 indices,
+    the shortest paths, the spanning trees and the components are computed with scipy.sparse.csgraph.
+    It has the few methods of nx.Graph() used by the solvers (nodes, edges, number_of_nodes, ...),
+    use to_networkx() at the edges of the system (drawing, eval_sol of the networkx world).
+    """
+
+    def __init__(self, labels: [], src, dst, weight):
+        """
+        labels: the label of every node, the node i of the arrays is labels[i]
+        src, dst, weight: the edges, with the nodes given by index
+        """
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        weight = _compact_weight(np.asarray(weight))
+
+        # only one edge per pair of nodes, the last one like nx.Graph()
+        number_nodes = len(self.labels)
+        low = np.minimum(src, dst).astype(np.int64)
+        high = np.maximum(src, dst).astype(np.int64)
+        key = low * number_nodes + high
+        _, last = np.unique(key[::-1], return_index=True)
+        keep = np.sort(len(key) - 1 - last)
+        self.src = src[keep]
+        self.dst = dst[keep]
+        self.weight = weight[keep]
+
+        rows = np.concatenate([self.src, self.dst])
+        cols = np.concatenate([self.dst, self.src])
+        data = np.concatenate([self.weight, self.weight])
+        self.matrix = csr_matrix((data, (rows, cols)), shape=(number_nodes, number_nodes))
+        self.matrix.indices = self.matrix.indices.astype(np.int32)
+        self.matrix.indptr = self.matrix.indptr.astype(np.int32)
+
+    def __repr__(self):
+        return "CSRGraph(nodes: " + str(self.number_of_nodes()) + ", edges: " + str(self.number_of_edges()) + ")"
+
+    @classmethod
+    def from_arrays(cls, edges):
+        """
+        build the graph from an edges array of the loader (fields src, dst and weight, nodes by label)
+        """
+        labels, inverse = np.unique(np.concatenate([edges['src'], edges['dst']]), return_inverse=True)
+        number_edges = len(edges)
+        return cls(labels.tolist(), inverse[:number_edges], inverse[number_edges:], edges['weight'])
+
+    @classmethod
+    def from_networkx(cls, graph):
+        labels = list(graph.nodes)
+        index = {label: i for i, label in enumerate(labels)}
+        src = []
+        dst = []
+        weight = []
+        for (i, j, w) in graph.edges(data='weight', default=1):
+            src.append(index[i])
+            dst.append(index[j])
+            weight.append(w)
+        return cls(labels, src, dst, weight)
+
+    def to_networkx(self):
+        graph = nx.Graph()
+        graph.add_nodes_from(self.labels)
+        graph.add_weighted_edges_from(self.edges(data='weight'))
+        return graph
+
+    @property
+    def nodes(self):
+        return self.labels
+
+    def edges(self, data=None):
+        """
+        return the list of edges (i, j), or (i, j, weight) if data is 'weight', with the labels of the nodes
+        """
+        labels = self.labels
+        if data is None:
+            return [(labels[i], labels[j]) for i, j in zip(self.src.tolist(), self.dst.tolist())]
+        return [(labels[i], labels[j], w) for i, j, w in zip(self.src.tolist(), self.dst.tolist(), self.weight.tolist())]
+
+    def number_of_nodes(self):
+        return len(self.labels)
+
+    def number_of_edges(self):
+        return len(self.weight)
+
+    def dijkstra(self, sources: []):
+        """
+        shortest paths from the sources (labels)
+        return (distances, predecessors), two arrays of shape (len(sources), number of nodes) indexed by node index
+        """
+        return dijkstra(self.matrix, directed=False, indices=[self.index[node] for node in sources],
+                        return_predecessors=True)
+
+    def minimum_spanning_tree(self):
+        """
+        return the list of edges (labels) of a minimum spanning tree (a forest if the graph is not connected)
+        """
+        keep = minimum_spanning_edges(self.number_of_nodes(), self.src, self.dst, self.weight)
+        labels = self.labels
+        return [(labels[i], labels[j]) for i, j in zip(self.src[keep].tolist(), self.dst[keep].tolist())]
+
+    def connected_components(self):
+        """
+        return the number of connected components and the component of every node
+        """
+        return connected_components(self.matrix, directed=False)
+
+
+def minimum_spanning_edges(number_nodes: int, src, dst, weight):
+    """
+    minimum spanning forest of the edges (src[k], dst[k], weight[k]) on the nodes 0..number_nodes-1
+    return the array of the indices k of the edges of the forest
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+    if len(weight) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # scipy drops the zero weights, a constant added to every weight does not change the spanning forests
+    shift = 1.0 - min(weight.min(), 0.0)
+    # for two parallel edges, keep the lightest one
+    low = np.minimum(src, dst)
+    high = np.maximum(src, dst)
+    order = np.lexsort((weight, high, low))
+    key = low[order] * number_nodes + high[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = key[1:] != key[:-1]
+    order = order[first]
+    key = key[first]
+    matrix = csr_matrix((weight[order] + shift, (low[order], high[order])), shape=(number_nodes, number_nodes))
+    tree = minimum_spanning_tree(matrix).tocoo()
+    # back from the pairs of nodes to the indices of the edges, key is sorted
+    tree_key = np.minimum(tree.row, tree.col).astype(np.int64) * number_nodes + np.maximum(tree.row, tree.col)
+    return order[np.searchsorted(key, tree_key)]
@@ -0,0 +1,109 @@
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from shortest_path import get_oracle
+from solution import get_indexed_graph
+
+
+def exact_cost(graph, terms: []):
+    """
+    return an estimate of the memory (bytes) and of the work (elementary operations)
+    of dreyfus_wagner on the instance
+    """
+    number_nodes = get_indexed_graph(graph).number_nodes
+    subsets = 2 ** max(len(terms) - 1, 0)
+    # the tables of the costs (float64), of the splits and of the predecessors (int32), the distances
+    # and the merges of the full subset (three float64 tables)
+    memory = subsets * number_nodes * 16 + number_nodes * number_nodes * 8 + subsets // 2 * number_nodes * 24
+    work = 3 ** max(len(terms) - 1, 0) // 2 * number_nodes + subsets * number_nodes * number_nodes
+    return memory, work
+
+
+def _submasks(mask: int):
+    """
+    return the array of the subsets of the bitmask, from 0 to mask
+    """
+    bits = [bit for bit in range(mask.bit_length()) if mask >> bit & 1]
+    counter = np.arange(2 ** len(bits), dtype=np.int64)
+    submasks = np.zeros(len(counter), dtype=np.int64)
+    for position, bit in enumerate(bits):
+        submasks |= ((counter >> position) & 1) << bit
+    return submasks
+
+
+def dreyfus_wagner(graph, terms: [], max_bytes: int = 2 ** 30, max_work: float = 5e9, fallback=None):
+    """
+    compute an optimal solution to the steiner problem with the dynamic programming of Dreyfus and Wagner
+    in O(3^k n + 2^k n^2) for k terminals, for the small instances and to check the heuristics
+    Graph: graph e.g. Graph with 7 nodes and 9 edges, or CSRGraph
+    List: terms e.g. [1,3,5,7]
+    cost[S][v] is the cost of the best tree which spans the terminals of the subset S (a bitmask)
+    and the node v, the last terminal is the root: the solution is cost[all the other terminals][root]
+    - merge: cost[S][v] = min over A in S of cost[A][v] + cost[S - A][v]
+    - move: cost[S][v] = min over u of cost[S][u] + distance(u, v)
+    max_bytes, max_work: limits of exact_cost, above them the fallback is used
+    fallback: function(graph, terms) returning a list of edges, e.g. approx_steiner,
+        if it is None a ValueError is raised when the instance is too large
+    return a list of edges
+    """
+    memory, work = exact_cost(graph, terms)
+    if memory > max_bytes or work > max_work:
+        if fallback is not None:
+            return fallback(graph, terms)
+        raise ValueError("too many terminals for the exact solver: " + str(len(terms)) +
+                         " (memory " + str(memory) + " bytes, work " + str(work) + ")")
+    if len(terms) <= 1:
+        return []
+
+    indexed = get_indexed_graph(graph)
+    oracle = get_oracle(graph)
+    number_nodes = indexed.number_nodes
+    distance = dijkstra(indexed.matrix, directed=False)
+    term_index = [indexed.index[node] for node in terms]
+    root = term_index[-1]
+    number = len(terms) - 1
+    full = 2 ** number - 1
+
+    cost = np.full((full + 1, number_nodes), np.inf)
+    # split[S][v]: the subset A of the merge at v, 0 if v is a terminal of a subset of one terminal
+    split = np.zeros((full + 1, number_nodes), dtype=np.int32)
+    # previous[S][v]: the node u of the move to v
+    previous = np.zeros((full + 1, number_nodes), dtype=np.int32)
+    columns = np.arange(number_nodes)
+    for subset in range(1, full + 1):
+        lowest = subset & -subset
+        if subset == lowest:
+            merged = np.full(number_nodes, np.inf)
+            merged[term_index[lowest.bit_length() - 1]] = 0
+        else:
+            # the subsets A which have the lowest terminal, every split is seen once
+            firsts = lowest | _submasks(subset ^ lowest)[:-1]
+            candidates = cost[firsts] + cost[subset ^ firsts]
+            best = np.argmin(candidates, axis=0)
+            merged = candidates[best, columns]
+            split[subset] = firsts[best]
+        # move from the best node u to every v
+        total = merged[:, None] + distance
+        previous[subset] = np.argmin(total, axis=0)
+        cost[subset] = total[previous[subset], columns]
+
+    if not np.isfinite(cost[full][root]):
+        raise ValueError("the terminals are not connected")
+
+    # rebuild the tree from the root
+    labels = indexed.labels
+    edge_ids = set()
+    stack = [(full, root)]
+    while stack:
+        subset, node = stack.pop()
+        start = int(previous[subset][node])
+        if start != node:
+            path = oracle.path(labels[start], labels[node])
+            for i in range(len(path) - 1):
+                edge_ids.add(indexed.edge_id((path[i], path[i + 1])))
+        first = int(split[subset][start])
+        if first != 0:
+            stack.append((first, start))
+            stack.append((subset ^ first, start))
+    # return a list of edges
+    return [indexed.edge_labels(edge_id) for edge_id in edge_ids]
@@ -0,0 +1,109 @@
+import os
+
+import networkx as nx
+import numpy as np
+
+from csr_graph import CSRGraph
+
+# dtype of the edges of a cached instance
+EDGE_DTYPE_INT = np.dtype([('src', np.int32), ('dst', np.int32), ('weight', np.int64)])
+EDGE_DTYPE_FLOAT = np.dtype([('src', np.int32), ('dst', np.int32), ('weight', np.float64)])
+
+
+def read_stp(stein_file: str):
+    """
+    read a steinlib file in one pass
+    return the edges (structured array with the fields src, dst and weight) and the terms (array)
+    """
+    src = []
+    dst = []
+    weight = []
+    terms = []
+    section = None
+    with open(stein_file) as my_file:
+        for line in my_file:
+            tokens = line.split()
+            if not tokens:
+                continue
+            keyword = tokens[0].upper()
+            if keyword == "SECTION":
+                section = tokens[1].upper() if len(tokens) > 1 else None
+            elif keyword == "END":
+                section = None
+            elif section == "GRAPH" and keyword in ("E", "A"):
+                src.append(int(tokens[1]))
+                dst.append(int(tokens[2]))
+                weight.append(tokens[3])
+            elif section == "TERMINALS" and keyword == "T":
+                terms.append(int(tokens[1]))
+
+    try:
+        weight = [int(w) for w in weight]
+        dtype = EDGE_DTYPE_INT
+    except ValueError:
+        weight = [float(w) for w in weight]
+        dtype = EDGE_DTYPE_FLOAT
+    edges = np.empty(len(src), dtype=dtype)
+    edges['src'] = src
+    edges['dst'] = dst
+    edges['weight'] = weight
+    return edges, np.array(terms, dtype=np.int32)
+
+
+def cache_paths(stein_file: str):
+    """
+    return the paths of the binary cache of a steinlib file, beside the file
+    """
+    return stein_file + ".edges.npy", stein_file + ".terms.npy"
+
+
+def load_arrays(stein_file: str, use_cache: bool = True):
+    """
+    return the edges and the terms arrays of a steinlib file
+    the arrays are read from the binary cache (memory-mapped) when it is newer than the file,
+    otherwise the file is parsed and the cache is written
+    """
+    edges_path, terms_path = cache_paths(stein_file)
+    if use_cache:
+        try:
+            source_time = os.path.getmtime(stein_file)
+            if os.path.getmtime(edges_path) >= source_time and os.path.getmtime(terms_path) >= source_time:
+                return np.load(edges_path, mmap_mode='r'), np.load(terms_path, mmap_mode='r')
+        except (OSError, ValueError):
+            pass
+    edges, terms = read_stp(stein_file)
+    if use_cache:
+        try:
+            np.save(edges_path, edges)
+            np.save(terms_path, terms)
+        except OSError:
+            # read-only directory, the cache is only an optimization
+            pass
+    return edges, terms
+
+
+def to_networkx(edges):
+    """
+    build a nx.Graph() from an edges array
+    """
+    graph = nx.Graph()
+    graph.add_weighted_edges_from(zip(edges['src'].tolist(), edges['dst'].tolist(), edges['weight'].tolist()))
+    return graph
+
+
+def load_instance(stein_file: str, use_cache: bool = True):
+    """
+    read a steinlib file
+    return the graph (nx.Graph()) and the terms list
+    """
+    edges, terms = load_arrays(stein_file, use_cache)
+    return to_networkx(edges), terms.tolist()
+
+
+def load_csr(stein_file: str, use_cache: bool = True):
+    """
+    read a steinlib file
+    return the graph as a CSRGraph and the terms list
+    """
+    edges, terms = load_arrays(stein_file, use_cache)
+    return CSRGraph.from_arrays(edges), terms.tolist()
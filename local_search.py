@@ -0,0 +1,224 @@
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from csr_graph import minimum_spanning_edges
+from shortest_path import _rebuild_path, get_oracle
+from solution import get_indexed_graph
+
+# the shortest path between the two parts of the tree of a key path exchange is read from the cached rows
+# of the oracle when one part has at most this many nodes, else it is one multi-source dijkstra
+ORACLE_SIDE_MAX = 16
+
+
+class LocalSearch(object):
+    """
+    This class improves a steiner tree with deterministic moves until none of them improves it:
+    - steiner vertex elimination: remove a selected node which is not a terminal
+    - steiner vertex insertion: add a node which has two neighbors in the tree
+    - key path exchange: replace a key path (a path between two terminals or branching nodes
+      whose inner nodes have degree 2) by the shortest path between the two parts of the tree
+    a tree is given by its nodes: its edges are the minimum spanning tree of the induced subgraph,
+    without the leaves which are not terminals
+    """
+
+    def __init__(self, graph, terms: []):
+        """
+        graph: nx.Graph() or CSRGraph
+        """
+        self.indexed = get_indexed_graph(graph)
+        self.oracle = get_oracle(graph)
+        self.u, self.v, self.weight = self.indexed.arrays()
+        self.is_term = np.zeros(self.indexed.number_nodes, dtype=bool)
+        self.is_term[[self.indexed.index[node] for node in terms]] = True
+        self.number_terms = len(terms)
+        self.moves = {"elimination": 0, "insertion": 0, "key_path": 0}
+
+    def __repr__(self):
+        return "LocalSearch(" + ", ".join(name + ": " + str(number) for name, number in self.moves.items()) + ")"
+
+    def improve(self, sol: [], max_rounds: int = 1000):
+        """
+        apply the moves until none of them improves the tree, or max_rounds improving moves
+        return a list of edges
+        """
+        if self.number_terms <= 1:
+            return []
+        mask = np.zeros(self.indexed.number_nodes, dtype=bool)
+        for (i, j) in sol:
+            mask[self.indexed.index[i]] = True
+            mask[self.indexed.index[j]] = True
+        tree, cost = self._tree(mask)
+        for _ in range(max_rounds):
+            improved = self._vertex_elimination(tree, cost)
+            if improved is None:
+                improved = self._vertex_insertion(tree, cost)
+            if improved is None:
+                improved = self._key_path_exchange(tree, cost)
+            if improved is None:
+                break
+            tree, cost = improved
+        return [self.indexed.edge_labels(edge_id) for edge_id in tree.tolist()]
+
+    def _tree(self, mask):
+        """
+        return the edge ids and the cost of the tree of the nodes of mask,
+        the cost is inf if the tree does not span the terminals
+        """
+        u, v, weight = self.u, self.v, self.weight
+        induced = np.flatnonzero(mask[u] & mask[v])
+        tree = induced[minimum_spanning_edges(len(mask), u[induced], v[induced], weight[induced])]
+        # prune the leaves which are not terminals
+        while True:
+            degree = np.bincount(u[tree], minlength=len(mask)) + np.bincount(v[tree], minlength=len(mask))
+            leaves = (degree == 1) & ~self.is_term
+            if not leaves.any():
+                break
+            tree = tree[~(leaves[u[tree]] | leaves[v[tree]])]
+        nodes = np.count_nonzero(degree)
+        if len(tree) != nodes - 1 or np.count_nonzero(degree[self.is_term]) != self.number_terms:
+            return tree, np.inf
+        return tree, weight[tree].sum()
+
+    def _nodes(self, tree):
+        mask = np.zeros(len(self.is_term), dtype=bool)
+        mask[self.u[tree]] = True
+        mask[self.v[tree]] = True
+        return mask
+
+    def _better(self, mask, cost):
+        """
+        return the tree of mask and its cost if it is cheaper than cost, else None
+        """
+        tree, new_cost = self._tree(mask)
+        if new_cost < cost - 1e-9:
+            return tree, new_cost
+        return None
+
+    def _vertex_elimination(self, tree, cost):
+        mask = self._nodes(tree)
+        for node in np.flatnonzero(mask & ~self.is_term).tolist():
+            mask[node] = False
+            improved = self._better(mask, cost)
+            mask[node] = True
+            if improved is not None:
+                self.moves["elimination"] += 1
+                return improved
+        return None
+
+    def _vertex_insertion(self, tree, cost):
+        mask = self._nodes(tree)
+        u, v = self.u, self.v
+        # the nodes out of the tree with two neighbors in the tree at least
+        touching = mask[u] != mask[v]
+        outside = np.where(mask[u[touching]], v[touching], u[touching])
+        count = np.bincount(outside, minlength=len(mask))
+        for node in np.flatnonzero(count >= 2).tolist():
+            mask[node] = True
+            improved = self._better(mask, cost)
+            mask[node] = False
+            if improved is not None:
+                self.moves["insertion"] += 1
+                return improved
+        return None
+
+    def _key_path_exchange(self, tree, cost):
+        u, v = self.indexed.edge_u, self.indexed.edge_v
+        mask = self._nodes(tree)
+        incident = {}
+        for edge_id in tree.tolist():
+            incident.setdefault(u[edge_id], []).append(edge_id)
+            incident.setdefault(v[edge_id], []).append(edge_id)
+        key = {node for node, edges in incident.items() if self.is_term[node] or len(edges) != 2}
+
+        seen = set()
+        for start in key:
+            for first_edge in incident[start]:
+                if first_edge in seen:
+                    continue
+                # follow the key path from start
+                path_edges = [first_edge]
+                node = u[first_edge] if v[first_edge] == start else v[first_edge]
+                while node not in key:
+                    next_edge = incident[node][0] if incident[node][0] != path_edges[-1] else incident[node][1]
+                    path_edges.append(next_edge)
+                    node = u[next_edge] if v[next_edge] == node else v[next_edge]
+                seen.update(path_edges)
+                improved = self._reconnect(tree, cost, mask, incident, start, path_edges)
+                if improved is not None:
+                    self.moves["key_path"] += 1
+                    return improved
+        return None
+
+    def _reconnect(self, tree, cost, mask, incident, start, path_edges):
+        """
+        remove the key path from the tree and join the two parts with the shortest path between them
+        return the new tree and its cost if it is cheaper, else None
+        """
+        u, v = self.indexed.edge_u, self.indexed.edge_v
+        removed = set(path_edges)
+        inner = {u[edge_id] for edge_id in path_edges} | {v[edge_id] for edge_id in path_edges}
+        # the part of start
+        part = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for edge_id in incident[node]:
+                if edge_id in removed:
+                    continue
+                neighbor = u[edge_id] if v[edge_id] == node else v[edge_id]
+                if neighbor not in part:
+                    part.add(neighbor)
+                    stack.append(neighbor)
+        other = mask.copy()
+        other[list(part)] = False
+        for node in inner:
+            if node not in part and len(incident[node]) == 2 and not self.is_term[node]:
+                # an inner node of the key path
+                other[node] = False
+        if not other.any():
+            return None
+
+        length, path = self._shortest_path(list(part), np.flatnonzero(other), self.weight[path_edges].sum())
+        if path is None:
+            return None
+        new_mask = mask.copy()
+        for node in inner:
+            new_mask[node] = node in part or other[node]
+        new_mask[path] = True
+        return self._better(new_mask, cost)
+
+    def _shortest_path(self, part: [], targets, limit: float):
+        """
+        return the length and the nodes of the shortest path from a node of part to a node of targets,
+        or (inf, None) if it is not shorter than limit
+        a small side reuses the rows of the shared oracle, the same parts come back from one key path
+        and one round to the next, otherwise a multi-source dijkstra stops at limit
+        """
+        if min(len(part), len(targets)) <= ORACLE_SIDE_MAX:
+            sources, goals = (np.array(part), targets) if len(part) <= len(targets) else (targets, np.array(part))
+            labels = self.indexed.labels
+            rows = self.oracle.rows([labels[node] for node in sources.tolist()])
+            dists = np.array([dist[goals] for (_, dist) in rows])
+            k, g = np.unravel_index(np.argmin(dists), dists.shape)
+            if dists[k, g] >= limit - 1e-9:
+                return np.inf, None
+            return dists[k, g], _rebuild_path(rows[k][0], int(sources[k]), int(goals[g]))
+        dist, pred, _ = dijkstra(self.indexed.matrix, directed=False, indices=part, return_predecessors=True,
+                                 min_only=True, limit=limit)
+        end = targets[np.argmin(dist[targets])]
+        if dist[end] >= limit - 1e-9:
+            return np.inf, None
+        path = []
+        node = end
+        while node >= 0:
+            path.append(node)
+            node = pred[node]
+        return dist[end], path
+
+
+def local_search(graph, terms: [], sol: [], max_rounds: int = 1000):
+    """
+    improve a solution with LocalSearch
+    return a list of edges
+    """
+    return LocalSearch(graph, terms).improve(sol, max_rounds)
@@ -0,0 +1,88 @@
+import csv
+import json
+from collections import deque
+
+# fields of a sample sent by annealing() to its observers
+FIELDS = ["iteration", "temperature", "score", "best_score", "acceptance_rate", "move_time"]
+
+
+class TrajectorySink(object):
+    """
+    keep the iteration and the score of every sample in two lists, the points_x and points_y of annealing()
+    """
+
+    def __init__(self):
+        self.points_x = []
+        self.points_y = []
+
+    def record(self, sample: dict):
+        self.points_x.append(sample["iteration"])
+        self.points_y.append(sample["score"])
+
+    def close(self):
+        pass
+
+
+class RingBufferSink(object):
+    """
+    keep the last capacity samples in memory
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.samples = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __iter__(self):
+        return iter(self.samples)
+
+    def record(self, sample: dict):
+        self.samples.append(sample)
+
+    def close(self):
+        pass
+
+
+class CSVSink(object):
+    """
+    write every sample as a line of a csv file, with a header line
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, sample: dict):
+        self.writer.writerow(sample)
+
+    def close(self):
+        self.file.close()
+
+
+class JSONLSink(object):
+    """
+    write every sample as a json line, the file is appended
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "a")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, sample: dict):
+        self.file.write(json.dumps(sample) + "\n")
+
+    def close(self):
+        self.file.close()
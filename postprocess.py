@@ -0,0 +1,58 @@
+from collections import deque
+
+import numpy as np
+
+from csr_graph import minimum_spanning_edges
+from solution import get_indexed_graph
+
+
+def selected_nodes_mst(graph, sol: []):
+    """
+    minimum spanning tree (a forest if the nodes are not connected) of the subgraph
+    induced by the nodes of the solution, computed by scipy.sparse.csgraph
+    graph: nx.Graph() or CSRGraph
+    return a list of edges
+    """
+    indexed = get_indexed_graph(graph)
+    selected = np.zeros(indexed.number_nodes, dtype=bool)
+    for (i, j) in sol:
+        selected[indexed.index[i]] = True
+        selected[indexed.index[j]] = True
+    u, v, weight = indexed.arrays()
+    induced = np.flatnonzero(selected[u] & selected[v])
+    tree_edges = induced[minimum_spanning_edges(indexed.number_nodes, u[induced], v[induced], weight[induced])]
+    return [indexed.edge_labels(edge_id) for edge_id in tree_edges.tolist()]
+
+
+def prune_leaves(terms: [], sol: []):
+    """
+    remove the leaves which are not terminals, until every leaf is a terminal
+    a queue of the nodes of degree 1 is used, so it is linear in the size of the solution
+    return a list of edges
+    """
+    terms = set(terms)
+    neighbors = {}
+    for (i, j) in sol:
+        neighbors.setdefault(i, set()).add(j)
+        neighbors.setdefault(j, set()).add(i)
+    leaves = deque(node for node, node_neighbors in neighbors.items()
+                   if len(node_neighbors) == 1 and node not in terms)
+    while leaves:
+        node = leaves.popleft()
+        if len(neighbors[node]) != 1:
+            continue
+        neighbor = neighbors[node].pop()
+        neighbors[neighbor].discard(node)
+        if len(neighbors[neighbor]) == 1 and neighbor not in terms:
+            leaves.append(neighbor)
+    return [(i, j) for (i, j) in sol if j in neighbors[i]]
+
+
+def clean_solution(graph, terms: [], sol: []):
+    """
+    post-processing of a solution: minimum spanning tree of the selected nodes,
+    then pruning of the leaves which are not terminals
+    if sol is connected, the cost of the result is never bigger than the cost of sol
+    return a list of edges
+    """
+    return prune_leaves(terms, selected_nodes_mst(graph, sol))
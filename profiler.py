@@ -0,0 +1,136 @@
+import json
+import time
+
+from state import State
+
+# the methods and properties of State timed by ProfiledState
+PROFILED_METHODS = ["random_node_action", "delete_random_node", "add_random_node", "get_closest_path_to_selected_node",
+                    "random_edge_action", "delete_random_sol", "add_random_sol", "random_edge_flips",
+                    "edge_flip_bounds", "flip_edge_id", "apply", "revert", "restore", "clean", "improve"]
+PROFILED_PROPERTIES = ["score", "graph_sol", "sol", "selected_nodes", "unselected_nodes"]
+# the moves, the last one done is the move of the accept or reject count
+MOVES = ["delete_random_node", "add_random_node", "delete_random_sol", "add_random_sol", "flip_edge_id"]
+
+
+class Profile(object):
+    """
+    This class counts the calls and accumulates the wall time of every operation of a State,
+    and counts the accepted and rejected moves by type of move
+    the times are inclusive: random_node_action contains the time of add_random_node
+    """
+
+    def __init__(self):
+        # name -> [calls, seconds]
+        self.operations = {}
+        # move -> [accepted, rejected]
+        self.moves = {}
+        self.last_move = None
+
+    def __repr__(self):
+        return "Profile(operations: " + str(len(self.operations)) + ")"
+
+    def record(self, name: str, seconds: float):
+        counter = self.operations.get(name)
+        if counter is None:
+            counter = self.operations[name] = [0, 0.0]
+        counter[0] += 1
+        counter[1] += seconds
+
+    def outcome(self, accepted: bool):
+        """
+        count the last move as accepted or rejected,
+        as "no_candidate" when no move was made (batch_optimize without a flip which passed its bound)
+        """
+        move = self.last_move if self.last_move is not None else "no_candidate"
+        counter = self.moves.setdefault(move, [0, 0])
+        counter[0 if accepted else 1] += 1
+        self.last_move = None
+
+    def as_dict(self):
+        return {
+            "operations": {name: {"calls": calls, "seconds": seconds}
+                           for name, (calls, seconds) in self.operations.items()},
+            "moves": {name: {"accepted": accepted, "rejected": rejected}
+                      for name, (accepted, rejected) in self.moves.items()},
+        }
+
+    def dump(self, path: str):
+        """
+        write the counters to a json file
+        """
+        with open(path, "w") as my_file:
+            json.dump(self.as_dict(), my_file, indent=2)
+
+    def summary(self) -> str:
+        """
+        return the counters as a text table, the slowest operations first
+        """
+        lines = ["operation".ljust(36) + "calls".rjust(10) + "total (s)".rjust(12) + "mean (us)".rjust(12)]
+        for name, (calls, seconds) in sorted(self.operations.items(), key=lambda item: -item[1][1]):
+            lines.append(name.ljust(36) + str(calls).rjust(10) + ("%.4f" % seconds).rjust(12) +
+                         ("%.2f" % (seconds / calls * 1e6)).rjust(12))
+        if self.moves:
+            lines.append("")
+            lines.append("move".ljust(36) + "accepted".rjust(10) + "rejected".rjust(12))
+            for name, (accepted, rejected) in sorted(self.moves.items()):
+                lines.append(name.ljust(36) + str(accepted).rjust(10) + str(rejected).rjust(12))
+        return "\n".join(lines)
+
+
+def _timed_method(name: str):
+    method = getattr(State, name)
+    is_move = name in MOVES
+
+    def timed(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.profile.record(name, time.perf_counter() - start)
+            if is_move:
+                self.profile.last_move = name
+
+    timed.__name__ = name
+    timed.__doc__ = method.__doc__
+    return timed
+
+
+def _timed_property(name: str):
+    getter = getattr(State, name).fget
+
+    def timed(self):
+        start = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            self.profile.record(name, time.perf_counter() - start)
+
+    return property(timed, doc=getter.__doc__)
+
+
+# State with a timer around every profiled operation, a state is switched to it only while it is profiled,
+# so the State class itself has no overhead
+ProfiledState = type("ProfiledState", (State,),
+                     dict([(name, _timed_method(name)) for name in PROFILED_METHODS] +
+                          [(name, _timed_property(name)) for name in PROFILED_PROPERTIES]))
+
+
+def enable_profiling(state: State, profile: Profile = None) -> Profile:
+    """
+    start to profile the state, its operations are recorded in profile (a new one by default)
+    return the profile
+    """
+    if profile is None:
+        profile = Profile()
+    state.profile = profile
+    state.__class__ = ProfiledState
+    return profile
+
+
+def disable_profiling(state: State):
+    """
+    stop to profile the state
+    """
+    if isinstance(state, ProfiledState):
+        state.__class__ = State
+        del state.profile
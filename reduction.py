@@ -0,0 +1,157 @@
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from csr_graph import CSRGraph
+
+
+class Reduction(object):
+    """
+    This class reduces a steiner instance with the classic tests, each one keeps at least one optimal tree:
+    - a leaf which is not a terminal is removed
+    - a terminal of degree 1 is fixed: its edge is in every solution, the terminal is merged in its neighbor
+    - a node of degree 2 which is not a terminal is replaced by one edge between its neighbors
+    - an edge longer than the shortest path between its nodes is removed
+    every edge of the reduced graph remembers the path of original edges it stands for,
+    expand() gives back a solution of the original graph
+    """
+
+    def __init__(self, graph, terms: [], long_edges: bool = True):
+        """
+        graph: nx.Graph() or CSRGraph, it is not modified
+        long_edges: run the long edge test (one dijkstra per node, by chunks)
+        """
+        self.original = graph
+        self.original_terms = list(terms)
+        working = graph.copy() if isinstance(graph, nx.Graph) else graph.to_networkx()
+        # every edge (by frozenset of its nodes) and its path in the original graph
+        self.paths = {frozenset((i, j)): [(i, j)] for (i, j) in working.edges}
+        # the edges of every solution, from the fixed terminals
+        self.fixed = []
+        self.fixed_weight = 0
+        self.counts = {"leaves": 0, "fixed_terminals": 0, "degree2": 0, "long_edges": 0}
+        self._terms = set(terms)
+        self._graph = working
+
+        self._reduce_degrees()
+        while long_edges and self._remove_long_edges() > 0:
+            self._reduce_degrees()
+
+        # the terms which are left, then the nodes which became terms
+        original_terms = set(terms)
+        self.terms = [node for node in terms if node in self._terms] + \
+                     [node for node in self._terms if node not in original_terms]
+        self.graph = working if isinstance(graph, nx.Graph) else CSRGraph.from_networkx(working)
+
+    def __repr__(self):
+        return ("Reduction(nodes: " + str(self.original.number_of_nodes()) + " -> " +
+                str(self.graph.number_of_nodes()) + ", edges: " + str(self.original.number_of_edges()) + " -> " +
+                str(self.graph.number_of_edges()) + ", fixed edges: " + str(len(self.fixed)) + ")")
+
+    def expand(self, sol: []):
+        """
+        return the edges of the original graph of a solution of the reduced graph, with the fixed edges
+        """
+        res = list(self.fixed)
+        for (i, j) in sol:
+            res.extend(self.paths[frozenset((i, j))])
+        return list(set(res))
+
+    def _reduce_degrees(self) -> bool:
+        """
+        run the tests of degree 0, 1 and 2 until none of them applies
+        return True if the graph is changed
+        """
+        graph = self._graph
+        terms = self._terms
+        changed = False
+        queue = list(graph.nodes)
+        while queue:
+            node = queue.pop()
+            if node not in graph:
+                continue
+            degree = graph.degree(node)
+            if node not in terms:
+                if degree <= 1:
+                    # a leaf or an isolated node which is not a terminal
+                    neighbors = list(graph.neighbors(node))
+                    graph.remove_node(node)
+                    self.counts["leaves"] += 1
+                    queue.extend(neighbors)
+                    changed = True
+                elif degree == 2:
+                    queue.extend(self._contract(node))
+                    self.counts["degree2"] += 1
+                    changed = True
+            elif degree == 1 and len(terms) > 1:
+                # the edge of the terminal is in every solution, the neighbor becomes a terminal
+                neighbor = next(iter(graph.neighbors(node)))
+                self.fixed.extend(self.paths.pop(frozenset((node, neighbor))))
+                self.fixed_weight += graph[node][neighbor]['weight']
+                graph.remove_node(node)
+                terms.discard(node)
+                terms.add(neighbor)
+                self.counts["fixed_terminals"] += 1
+                queue.append(neighbor)
+                changed = True
+        return changed
+
+    def _contract(self, node):
+        """
+        replace the node of degree 2 and its two edges by one edge between its neighbors,
+        the lighter edge is kept if the neighbors are already joined
+        return the neighbors
+        """
+        graph = self._graph
+        first, second = graph.neighbors(node)
+        weight = graph[node][first]['weight'] + graph[node][second]['weight']
+        path = self.paths.pop(frozenset((node, first))) + self.paths.pop(frozenset((node, second)))
+        graph.remove_node(node)
+        if not graph.has_edge(first, second) or graph[first][second]['weight'] > weight:
+            graph.add_edge(first, second, weight=weight)
+            self.paths[frozenset((first, second))] = path
+        return [first, second]
+
+    def _remove_long_edges(self, chunk: int = 256):
+        """
+        remove the edges longer than the shortest path between their nodes,
+        the dijkstras are limited to the longest edge and run by chunks of sources
+        return the number of removed edges
+        """
+        graph = self._graph
+        nodes = list(graph.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = list(graph.edges(data='weight'))
+        if not edges:
+            return 0
+        u = np.array([index[i] for (i, _, _) in edges])
+        v = np.array([index[j] for (_, j, _) in edges])
+        weight = np.array([w for (_, _, w) in edges], dtype=np.float64)
+        matrix = csr_matrix((np.concatenate([weight, weight]), (np.concatenate([u, v]), np.concatenate([v, u]))),
+                            shape=(len(nodes), len(nodes)))
+
+        long_edges = []
+        sources = np.unique(u)
+        for start in range(0, len(sources), chunk):
+            rows = sources[start:start + chunk]
+            dist = dijkstra(matrix, directed=False, indices=rows, limit=weight.max())
+            position = np.full(len(nodes), -1)
+            position[rows] = np.arange(len(rows))
+            in_chunk = np.flatnonzero(position[u] >= 0)
+            shortest = dist[position[u[in_chunk]], v[in_chunk]]
+            long_edges.extend(in_chunk[weight[in_chunk] > shortest * (1 + 1e-12) + 1e-12].tolist())
+
+        for k in long_edges:
+            (i, j, _) = edges[k]
+            graph.remove_edge(i, j)
+            del self.paths[frozenset((i, j))]
+        self.counts["long_edges"] += len(long_edges)
+        return len(long_edges)
+
+
+def reduce_instance(graph, terms: [], long_edges: bool = True):
+    """
+    return the Reduction of the instance, its graph and terms are the reduced instance
+    """
+    return Reduction(graph, terms, long_edges)
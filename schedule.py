@@ -0,0 +1,176 @@
+import math
+
+
+class LinearSchedule(object):
+    """
+    temperature - speed at every iteration, until the temperature is not positive
+    the cooling of the first version of the annealing
+    """
+
+    def __init__(self, speed: float):
+        self.speed = speed
+
+    def __repr__(self):
+        return "LinearSchedule(speed: " + str(self.speed) + ")"
+
+    def start(self, temperature: float):
+        """
+        called once before the first iteration with the start temperature
+        """
+        pass
+
+    def update(self, temperature: float, iteration: int, accepted: bool) -> float:
+        """
+        return the temperature of the next iteration
+        iteration: number of the iteration which is done, from 0
+        accepted: True if the move of this iteration is kept
+        """
+        if temperature > 0.0:
+            return temperature - self.speed
+        return temperature
+
+
+class ConstantSchedule(object):
+    """
+    the temperature does not change, e.g. for the replicas of the parallel tempering
+    """
+
+    def __repr__(self):
+        return "ConstantSchedule()"
+
+    def start(self, temperature: float):
+        pass
+
+    def update(self, temperature: float, iteration: int, accepted: bool) -> float:
+        return temperature
+
+
+class GeometricSchedule(object):
+    """
+    temperature * alpha at every iteration, the temperature never reaches 0
+    """
+
+    def __init__(self, alpha: float = 0.999, minimum: float = 1e-3):
+        """
+        alpha: factor of every iteration, between 0 and 1
+        minimum: the temperature stays above minimum
+        """
+        self.alpha = alpha
+        self.minimum = minimum
+
+    def __repr__(self):
+        return "GeometricSchedule(alpha: " + str(self.alpha) + ")"
+
+    def start(self, temperature: float):
+        pass
+
+    def update(self, temperature: float, iteration: int, accepted: bool) -> float:
+        return max(temperature * self.alpha, self.minimum)
+
+
+class LogarithmicSchedule(object):
+    """
+    start * log(2) / log(iteration + 2), the slow cooling of the convergence proofs
+    """
+
+    def __init__(self):
+        self.start_temperature = None
+
+    def __repr__(self):
+        return "LogarithmicSchedule()"
+
+    def start(self, temperature: float):
+        self.start_temperature = temperature
+
+    def update(self, temperature: float, iteration: int, accepted: bool) -> float:
+        return self.start_temperature * math.log(2) / math.log(iteration + 3)
+
+
+class ReheatingSchedule(object):
+    """
+    an other schedule which starts again every period iterations,
+    from ratio times the temperature of the previous start
+    """
+
+    def __init__(self, schedule, period: int = 1000, ratio: float = 0.5):
+        """
+        schedule: the schedule between two reheats
+        period: number of iterations between two reheats
+        ratio: the temperature of a reheat is ratio times the temperature of the previous start
+        """
+        self.schedule = schedule
+        self.period = period
+        self.ratio = ratio
+        self.start_temperature = None
+
+    def __repr__(self):
+        return "ReheatingSchedule(" + repr(self.schedule) + ", period: " + str(self.period) + ")"
+
+    def start(self, temperature: float):
+        self.start_temperature = temperature
+        self.schedule.start(temperature)
+
+    def update(self, temperature: float, iteration: int, accepted: bool) -> float:
+        if (iteration + 1) % self.period == 0:
+            self.start_temperature = self.start_temperature * self.ratio
+            self.schedule.start(self.start_temperature)
+            return self.start_temperature
+        return self.schedule.update(temperature, iteration % self.period, accepted)
+
+
+class AdaptiveSchedule(object):
+    """
+    the temperature follows the acceptance rate of the moves:
+    after every window of iterations, cool down if more moves than target were accepted, heat up otherwise
+    """
+
+    def __init__(self, target: float = 0.3, window: int = 100, factor: float = 0.9, minimum: float = 1e-3):
+        """
+        target: wanted rate of accepted moves
+        window: number of iterations between two changes of the temperature
+        factor: the temperature is multiplied by factor to cool down, divided to heat up
+        minimum: the temperature stays above minimum
+        """
+        self.target = target
+        self.window = window
+        self.factor = factor
+        self.minimum = minimum
+        self.accepted = 0
+
+    def __repr__(self):
+        return "AdaptiveSchedule(target: " + str(self.target) + ", window: " + str(self.window) + ")"
+
+    def start(self, temperature: float):
+        self.accepted = 0
+
+    def update(self, temperature: float, iteration: int, accepted: bool) -> float:
+        if accepted:
+            self.accepted += 1
+        if (iteration + 1) % self.window != 0:
+            return temperature
+        rate = self.accepted / self.window
+        self.accepted = 0
+        if rate > self.target:
+            return max(temperature * self.factor, self.minimum)
+        return temperature / self.factor
+
+
+SCHEDULES = {
+    "linear": LinearSchedule,
+    "constant": ConstantSchedule,
+    "geometric": GeometricSchedule,
+    "logarithmic": LogarithmicSchedule,
+    "adaptive": AdaptiveSchedule,
+}
+
+
+def get_schedule(name: str, speed: float = 0.01):
+    """
+    return a schedule with its default parameters by name, a key of SCHEDULES,
+    speed is only used by the linear schedule
+    """
+    if name == "linear":
+        return LinearSchedule(speed)
+    if name not in SCHEDULES:
+        raise ValueError("unknown schedule " + str(name))
+    return SCHEDULES[name]()
@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from approximation import APPROX_METHODS, eval_sol
+from loader import load_instance
+from schedule import get_schedule
+from simulated_annealing import annealing
+from state import State
+
+SERVICE_METHODS = list(APPROX_METHODS) + ["annealing"]
+
+# status of a job: queued -> running -> done, failed, cancelled or expired (deadline reached)
+FINISHED = ("done", "failed", "cancelled", "expired")
+
+# part of the time left before the deadline of a job kept for the end of the job (evaluation, transfer of the result)
+DEADLINE_MARGIN = 0.1
+
+# graphs of a worker process, graph id -> (graph, terms of the file), kept with their shared oracles
+# and indexed graphs for all the jobs of the process
+_worker_graphs = {}
+
+
+def _init_worker(graph_files: dict):
+    """
+    load the graphs registered before the start of the service
+    """
+    for graph_id, stein_file in graph_files.items():
+        _worker_graphs[graph_id] = load_instance(stein_file)
+
+
+def _solve_job(graph_id, stein_file: str, terms: [], method: str, budget: float, options: dict):
+    """
+    solve one job in a worker process, the graph is loaded at the first job of the process
+    budget: seconds of the annealing, unlimited if None
+    return the record of the job: the solution, its cost, the time and the time of the load of the graph
+    """
+    start = time.monotonic()
+    if graph_id not in _worker_graphs:
+        _worker_graphs[graph_id] = load_instance(stein_file)
+    graph, file_terms = _worker_graphs[graph_id]
+    if terms is None:
+        terms = file_terms
+    missing = [node for node in terms if node not in graph]
+    if missing:
+        raise ValueError("terminals not in the graph " + str(graph_id) + ": " + str(missing[:10]))
+    load_time = time.monotonic() - start
+
+    start = time.monotonic()
+    iterations = 0
+    if method in APPROX_METHODS:
+        sol = APPROX_METHODS[method](graph, terms)
+    elif method == "annealing":
+        sol = APPROX_METHODS[options.get("init", "approx")](graph, terms)
+        temperature = options.get("temperature", 30.0)
+        speed = options.get("speed", 0.01)
+        state = State(graph, terms, sol, temperature, speed)
+        state, points_x, _ = annealing(state, options.get("times", 3000), options.get("node_method", True),
+                                       schedule=get_schedule(options.get("schedule", "linear"), speed),
+                                       patience=options.get("patience"),
+                                       deadline=start + budget if budget is not None else None, keep_best=True)
+        iterations = points_x[-1] + 1 if points_x else 0
+        # the best configuration of the annealing is not worse than the initial one, keep the initial one
+        # only if the penalties of the score let an invalid tree be the best
+        if state.number_not_covered_terminals == 0 and state.number_components == 0:
+            sol = state.sol
+    else:
+        raise ValueError("unknown method " + str(method))
+    return {
+        "sol": sol,
+        "cost": eval_sol(graph, terms, sol),
+        "time": time.monotonic() - start,
+        "load_time": load_time,
+        "iterations": iterations,
+        "pid": os.getpid(),
+    }
+
+
+class Job(object):
+    """
+    This class holds one query of the service and its result
+    """
+
+    def __init__(self, job_id: int, graph_id, terms: [], method: str, budget: float, deadline: float, options: dict):
+        self.id = job_id
+        self.graph_id = graph_id
+        self.terms = terms
+        self.method = method
+        self.budget = budget
+        # time of the event loop when the result is no longer wanted, None for no deadline
+        self.deadline = deadline
+        self.options = options
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.finished = None
+        self.done = asyncio.get_running_loop().create_future()
+        # the call which expires the job at its deadline
+        self.timer = None
+
+    def __repr__(self):
+        return "Job(id: " + str(self.id) + ", graph: " + str(self.graph_id) + ", status: " + self.status + ")"
+
+    def finish(self, status: str, result: dict = None, error: str = None):
+        if self.status in FINISHED:
+            return
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.monotonic()
+        if self.timer is not None:
+            self.timer.cancel()
+        self.done.set_result(self.record())
+
+    def record(self) -> dict:
+        record = {
+            "job": self.id,
+            "graph": self.graph_id,
+            "method": self.method,
+            "status": self.status,
+            "latency": (self.finished if self.finished is not None else time.monotonic()) - self.submitted,
+        }
+        if self.result is not None:
+            record.update(self.result)
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+
+class SolveService(object):
+    """
+    This class is a long-lived solver of steiner queries on registered graphs:
+    the jobs are queued by the asyncio front end and solved by a pool of worker processes,
+    every worker process keeps its loaded graphs and their shortest path caches between the jobs,
+    so the latency of a query does not contain the load and the preprocessing of its graph after the first one
+    a queued job can be cancelled, a running one is bounded by its budget and its result is dropped
+    """
+
+    def __init__(self, workers: int = None, max_results: int = 10000):
+        """
+        workers: number of worker processes, os.cpu_count() by default
+        max_results: number of finished jobs kept in the result store, the oldest ones are dropped
+        """
+        self.workers = workers if workers is not None else os.cpu_count()
+        self.max_results = max_results
+        self.graph_files = {}
+        self.jobs = OrderedDict()
+        self.queue = None
+        self.executor = None
+        self.dispatchers = []
+        self.job_ids = itertools.count(1)
+
+    def __repr__(self):
+        return "SolveService(workers: " + str(self.workers) + ", graphs: " + str(len(self.graph_files)) + \
+               ", jobs: " + str(len(self.jobs)) + ")"
+
+    def register(self, graph_id, stein_file: str):
+        """
+        make a steinlib file available to the jobs under graph_id,
+        the graphs registered before start() are loaded by every worker process when it starts
+        """
+        if not os.path.exists(stein_file):
+            raise ValueError("no such file " + str(stein_file))
+        self.graph_files[graph_id] = stein_file
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(dict(self.graph_files),))
+        self.dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        """
+        cancel the queued jobs, wait for the running ones and stop the worker processes
+        """
+        for job in self.jobs.values():
+            if job.status == "queued":
+                job.finish("cancelled")
+        for _ in self.dispatchers:
+            await self.queue.put(None)
+        await asyncio.gather(*self.dispatchers)
+        self.dispatchers = []
+        self.executor.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def submit(self, graph_id, terms: [] = None, method: str = "approx", budget: float = None,
+                     deadline: float = None, **options) -> int:
+        """
+        queue a job
+        terms: the terminals, the terminals of the file of the graph by default
+        method: a name of SERVICE_METHODS
+        budget: seconds of the annealing
+        deadline: seconds from now after which the job expires, queued or running: its record is returned
+            at the deadline, a running job is also given a budget which ends before the deadline
+        options: annealing parameters: times, temperature, speed, schedule, patience, node_method and init
+        return the id of the job
+        """
+        if graph_id not in self.graph_files:
+            raise ValueError("unknown graph " + str(graph_id))
+        if method not in SERVICE_METHODS:
+            raise ValueError("unknown method " + str(method))
+        loop = asyncio.get_running_loop()
+        job = Job(next(self.job_ids), graph_id, list(terms) if terms is not None else None, method, budget,
+                  loop.time() + deadline if deadline is not None else None, options)
+        self.jobs[job.id] = job
+        if job.deadline is not None:
+            job.timer = loop.call_at(job.deadline, self._expire, job)
+        await self.queue.put(job)
+        return job.id
+
+    async def result(self, job_id: int) -> dict:
+        """
+        wait for the end of a job
+        return its record: the status, the latency and, when it is done, sol, cost, time and load_time
+        """
+        return await asyncio.shield(self.jobs[job_id].done)
+
+    async def solve(self, graph_id, terms: [] = None, method: str = "approx", budget: float = None,
+                    deadline: float = None, **options) -> dict:
+        """
+        submit a job and wait for its record
+        """
+        job_id = await self.submit(graph_id, terms, method, budget, deadline, **options)
+        return await self.result(job_id)
+
+    def status(self, job_id: int) -> str:
+        return self.jobs[job_id].status
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        cancel a job, return False if it is already finished
+        """
+        job = self.jobs[job_id]
+        if job.status in FINISHED:
+            return False
+        job.finish("cancelled")
+        self._trim()
+        return True
+
+    def _expire(self, job: Job):
+        job.finish("expired")
+        self._trim()
+
+    def _trim(self):
+        """
+        drop the oldest finished jobs above max_results
+        """
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(len(finished) - self.max_results, 0)]:
+            del self.jobs[job_id]
+
+    async def _dispatch(self):
+        """
+        run the queued jobs one by one in the worker processes, there is one dispatcher per worker
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job is None:
+                return
+            if job.status != "queued":
+                continue
+            budget = job.budget
+            if job.deadline is not None:
+                remaining = job.deadline - loop.time()
+                budget = remaining * (1 - DEADLINE_MARGIN) if budget is None else \
+                    min(budget, remaining * (1 - DEADLINE_MARGIN))
+            job.status = "running"
+            future = loop.run_in_executor(self.executor, _solve_job, job.graph_id,
+                                          self.graph_files[job.graph_id], job.terms, job.method, budget,
+                                          job.options)
+            # a job which expires or is cancelled while it runs is already finished, its result is dropped,
+            # but the worker is busy until the end of the job
+            try:
+                result = await future
+                job.finish("done", result)
+            except Exception as error:
+                job.finish("failed", error=repr(error))
+            self._trim()
+
+
+async def _handle_client(service: SolveService, reader, writer):
+    """
+    one json request per line, one json response per line:
+    {"op": "register", "graph": id, "file": path}
+    {"op": "submit", "graph": id, "terms": [...], "method": "annealing", "budget": 1.0, "deadline": 5.0, ...}
+    {"op": "result", "job": id}, {"op": "status", "job": id}, {"op": "cancel", "job": id}
+    {"op": "solve", ...} is a submit followed by a result
+    """
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        try:
+            request = json.loads(line)
+            op = request.pop("op")
+            if op == "register":
+                service.register(request["graph"], request["file"])
+                response = {"ok": True}
+            elif op in ("submit", "solve"):
+                job_id = await service.submit(request.pop("graph"), **request)
+                response = await service.result(job_id) if op == "solve" else {"job": job_id}
+            elif op == "result":
+                response = await service.result(request["job"])
+            elif op == "status":
+                response = {"job": request["job"], "status": service.status(request["job"])}
+            elif op == "cancel":
+                response = {"job": request["job"], "cancelled": service.cancel(request["job"])}
+            else:
+                raise ValueError("unknown op " + str(op))
+        except Exception as error:
+            response = {"error": repr(error)}
+        writer.write((json.dumps(response) + "\n").encode())
+        await writer.drain()
+    writer.close()
+
+
+async def serve(graph_files: dict, host: str = "127.0.0.1", port: int = 8765, workers: int = None):
+    """
+    run a SolveService behind a json lines tcp server until it is interrupted
+    graph_files: graph id -> steinlib file, registered before the start of the workers
+    """
+    service = SolveService(workers)
+    for graph_id, stein_file in graph_files.items():
+        service.register(graph_id, stein_file)
+    async with service:
+        server = await asyncio.start_server(lambda reader, writer: _handle_client(service, reader, writer),
+                                            host, port)
+        async with server:
+            print("serving " + str(len(graph_files)) + " graphs on " + host + ":" + str(port))
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve steiner queries on preloaded graphs")
+    parser.add_argument("files", nargs="*", help="steinlib files, registered under their file name without .stp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args(argv)
+    graph_files = {os.path.splitext(os.path.basename(path))[0]: path for path in args.files}
+    try:
+        asyncio.run(serve(graph_files, args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
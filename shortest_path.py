@@ -0,0 +1,187 @@
+import math
+import weakref
+from collections import OrderedDict
+
+import networkx as nx
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from solution import get_indexed_graph
+
+
+class ShortestPathOracle(object):
+    """
+    This class answers shortest path queries on a graph.
+    The rows (one per source node) are computed lazily with a single source
+    dijkstra and kept in a LRU cache, so the memory stays bounded.
+    A row is only a predecessor array and a distance array over the nodes of the
+    IndexedGraph, computed by scipy.sparse.csgraph, the paths are rebuilt when they are asked.
+    """
+
+    def __init__(self, graph, max_rows: int = 512):
+        """
+        graph: nx.Graph()
+        max_rows: maximum number of source rows kept in memory, None for no limit
+        """
+        # no reference to the graph, the registries of the graph are weak keyed and the oracle is one of their values
+        self.indexed = get_indexed_graph(graph)
+        self.max_rows = max_rows
+        self._rows = OrderedDict()
+
+    def __repr__(self):
+        return "ShortestPathOracle(rows: " + str(len(self._rows)) + ", max_rows: " + str(self.max_rows) + ")"
+
+    def row(self, source):
+        """
+        return (predecessors, distances) of the shortest paths from source, indexed by node index
+        predecessors: array of the previous node index on the path from source, negative if none
+        distances: array of the length of the path from source, inf if not reachable
+        """
+        source_index = self.indexed.index[source]
+        if source_index in self._rows:
+            self._rows.move_to_end(source_index)
+            return self._rows[source_index]
+        dist, pred = dijkstra(self.indexed.matrix, directed=False, indices=source_index, return_predecessors=True)
+        return self._store(source_index, (pred, dist))
+
+    def rows(self, sources: []):
+        """
+        return the list of rows of the sources, the missing rows are computed by one scipy call
+        """
+        index = self.indexed.index
+        missing = []
+        for source in sources:
+            if index[source] not in self._rows:
+                missing.append(index[source])
+        missing = list(dict.fromkeys(missing))
+        if missing:
+            dist, pred = dijkstra(self.indexed.matrix, directed=False, indices=missing, return_predecessors=True)
+            for k, source_index in enumerate(missing):
+                self._store(source_index, (pred[k].copy(), dist[k].copy()))
+        # a row can be evicted already if there are more sources than max_rows
+        return [self._rows[index[source]] if index[source] in self._rows else self.row(source)
+                for source in sources]
+
+    def _store(self, source_index: int, row):
+        self._rows[source_index] = row
+        if self.max_rows is not None and len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+        return row
+
+    def distances(self, source):
+        """
+        return dict node -> length of the shortest path from source, for the reachable nodes
+        """
+        labels = self.indexed.labels
+        dist = self.row(source)[1]
+        return {labels[i]: d for i, d in enumerate(dist.tolist()) if d < math.inf}
+
+    def distance(self, source, target):
+        """
+        return the length of the shortest path from source to target
+        """
+        return float(self.row(source)[1][self.indexed.index[target]])
+
+    def path(self, source, target):
+        """
+        return the shortest path from source to target as a list of nodes
+        """
+        pred, dist = self.row(source)
+        source_index = self.indexed.index[source]
+        node = self.indexed.index[target]
+        if dist[node] == math.inf:
+            raise nx.NetworkXNoPath("node " + str(target) + " not reachable from " + str(source))
+        labels = self.indexed.labels
+        return [labels[i] for i in _rebuild_path(pred, source_index, node)]
+
+    def clear(self):
+        self._rows.clear()
+
+
+class CandidateIndex(object):
+    """
+    For every terminal, the k nearest nodes sorted by distance with the paths to them,
+    built once per graph and terminal set from the rows of the oracle.
+    """
+
+    def __init__(self, oracle: ShortestPathOracle, terms: [], k: int = 32):
+        self.oracle = oracle
+        self.k = k
+        self._nodes = {}
+        self._paths = {}
+        index = oracle.indexed.index
+        for term, (pred, dist) in zip(terms, oracle.rows(terms)):
+            term_index = index[term]
+            order = np.argsort(dist, kind='stable')
+            order = order[np.isfinite(dist[order]) & (order != term_index)][:k]
+            self._nodes[term_index] = order.tolist()
+            self._paths[term_index] = [_rebuild_path(pred, term_index, node) for node in order.tolist()]
+
+    def __repr__(self):
+        return "CandidateIndex(terms: " + str(len(self._nodes)) + ", k: " + str(self.k) + ")"
+
+    def nearest(self, term_index: int, accept):
+        """
+        return the path (list of node indices) from the terminal to its nearest node accepted
+        by the function accept(node index), or None if no node is accepted
+        the k nearest nodes are tried first, then all the nodes of the row of the terminal
+        """
+        for node, path in zip(self._nodes[term_index], self._paths[term_index]):
+            if accept(node):
+                return path
+        pred, dist = self.oracle.row(self.oracle.indexed.labels[term_index])
+        order = np.argsort(dist, kind='stable')
+        for node in order[self.k + 1:].tolist():
+            if dist[node] == math.inf:
+                break
+            if node != term_index and accept(node):
+                return _rebuild_path(pred, term_index, node)
+        return None
+
+
+def _rebuild_path(pred, source_index: int, node: int):
+    """
+    return the path from source_index to node (node indices) with the predecessors of a row
+    """
+    path = [node]
+    while node != source_index:
+        node = int(pred[node])
+        path.append(node)
+    path.reverse()
+    return path
+
+
+# one oracle per graph, shared by State, approx_steiner and the annealing drivers
+_oracles = weakref.WeakKeyDictionary()
+
+
+def get_oracle(graph, max_rows: int = 512):
+    """
+    return the shared shortest path oracle of the graph, create it if needed
+    """
+    oracle = _oracles.get(graph)
+    if oracle is None:
+        oracle = ShortestPathOracle(graph, max_rows)
+        _oracles[graph] = oracle
+    return oracle
+
+
+# the candidate indexes of every graph, terminal set -> CandidateIndex in a LRU cache
+_candidates = weakref.WeakKeyDictionary()
+
+
+def get_candidate_index(graph, terms: [], k: int = 32, max_indexes: int = 16):
+    """
+    return the shared CandidateIndex of the graph and the terms, create it if needed
+    max_indexes: number of terminal sets whose index is kept per graph, the least recently used one is dropped,
+        so a long-lived process which solves many terminal sets on the same graph keeps a bounded memory
+    """
+    indexes = _candidates.setdefault(graph, OrderedDict())
+    key = (tuple(terms), k)
+    if key in indexes:
+        indexes.move_to_end(key)
+        return indexes[key]
+    index = indexes[key] = CandidateIndex(get_oracle(graph), terms, k)
+    if len(indexes) > max_indexes:
+        indexes.popitem(last=False)
+    return index
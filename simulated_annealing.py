@@ -1,50 +1,172 @@
 import random
 import sys
+import os
 import itertools as it
-import matplotlib.pyplot as plt
 import math
-import networkx as nx
-from steinlib.instance import SteinlibInstance
-from steinlib.parser import SteinlibParser
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 import util
+from loader import load_instance
+from observers import TrajectorySink
+from profiler import Profile, ProfiledState, disable_profiling, enable_profiling
+from schedule import LinearSchedule
 from state import State
 
 
-def annealing(state: State, times: int, node_method=True):
+def annealing(state: State, times: int, node_method=True, schedule=None, acceptance=None, patience: int = None,
+              batch: int = None, observers: [] = None, every: int = 10, profile: Profile = None,
+              deadline: float = None, keep_best: bool = None):
     """
     Simulated annealing algorithm
+    schedule: the cooling schedule (schedule.py), LinearSchedule(state.speed) by default
+    acceptance: the probability function of a move, func_proba by default, or func_sigmoid_proba
+    patience: stop early when the best score is not improved during patience iterations
+    batch: with the edge method, every iteration draws batch edge flips and keeps at most one (batch_optimize),
+        the acceptance is then always func_proba
+    observers: the sinks of observers.py, every sample (iteration, temperature, score, best score,
+        acceptance rate and mean move time since the last sample) is sent to their record method,
+        a TrajectorySink by default, [] disables the samples
+    every: one sample every this many iterations, the last iteration is always sampled
+    profile: a profiler.Profile, the operations of the state and the accepted and rejected moves are counted in it
+        during the run (profile.summary() or profile.dump(path) at the end), no overhead if it is None
+    deadline: stop early when time.monotonic() reaches deadline
+    keep_best: go back to the best configuration found if the run ends on a worse one,
+        None (default) only when patience or deadline stops the run early, True always, False never
+    return the state and the points_x and points_y of the first TrajectorySink of the observers (else empty lists)
     """
-    points_x = []
-    points_y = []
+    if batch is not None and node_method:
+        raise ValueError("batch proposals are only for the edge method")
+    if profile is not None:
+        enable_profiling(state, profile)
+        try:
+            return annealing(state, times, node_method, schedule, acceptance, patience, batch, observers, every,
+                             deadline=deadline, keep_best=keep_best)
+        finally:
+            disable_profiling(state)
+    profiled = isinstance(state, ProfiledState)
+    rng = np.random.default_rng(random.getrandbits(64)) if batch is not None else None
+    if schedule is None:
+        schedule = LinearSchedule(state.speed)
+    if acceptance is None:
+        acceptance = func_proba
+    if observers is None:
+        observers = [TrajectorySink()]
+    trajectory = next((sink for sink in observers if isinstance(sink, TrajectorySink)), None)
+    observed = len(observers) > 0
+    schedule.start(state.temperature)
+
+    best_score = state.score
+    best_iteration = 0
+    if keep_best is None:
+        keep_best = patience is not None or deadline is not None
+    best_snapshot = state.snapshot() if keep_best else None
+    # moves since the last sample
+    window_moves = 0
+    window_accepted = 0
+    window_time = 0.0
+    i = -1
     for i in range(times):
-        state = optimize(state, node_method)
-        if i % 10 == 0:
-            points_x.append(i)
-            points_y.append(state.score)
-    return state, points_x, points_y
+        if observed or profiled:
+            start = time.perf_counter()
+        if batch is not None:
+            state, accepted = batch_optimize(state, batch, rng)
+        else:
+            state, accepted = optimize(state, node_method, acceptance)
+        if profiled:
+            state.profile.record("batch_optimize" if batch is not None else "optimize", time.perf_counter() - start)
+            state.profile.outcome(accepted)
+        state.temperature = schedule.update(state.temperature, i, accepted)
+        score = state.score
+        if score < best_score:
+            best_score = score
+            best_iteration = i
+            if keep_best:
+                best_snapshot = state.snapshot()
+        if observed:
+            window_time += time.perf_counter() - start
+            window_moves += 1
+            window_accepted += accepted
+            if i % every == 0:
+                _send_sample(observers, i, state.temperature, score, best_score, window_accepted / window_moves,
+                             window_time / window_moves)
+                window_moves = 0
+                window_accepted = 0
+                window_time = 0.0
+        if patience is not None and i - best_iteration >= patience:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+    if window_moves > 0:
+        # the last iteration is always sampled
+        _send_sample(observers, i, state.temperature, state.score, best_score, window_accepted / window_moves,
+                     window_time / window_moves)
+    if keep_best and state.score > best_score:
+        state.restore(best_snapshot)
+    if trajectory is None:
+        return state, [], []
+    return state, trajectory.points_x, trajectory.points_y
+
+
+def _send_sample(observers: [], iteration, temperature, score, best_score, acceptance_rate, move_time):
+    sample = {
+        "iteration": iteration,
+        "temperature": temperature,
+        "score": score,
+        "best_score": best_score,
+        "acceptance_rate": acceptance_rate,
+        "move_time": move_time,
+    }
+    for sink in observers:
+        sink.record(sample)
 
 
-def optimize(state: State, node_method):
+def optimize(state: State, node_method, acceptance=None):
     """
     Update function or function voisine
-    Input an old state, output a new state with probability
+    Do a random move on the state, keep it with probability or undo it in place
+    return the state and True if the move is kept
     """
-    old_sol = []
-    for e in state.sol:
-        old_sol.append(e)
+    if acceptance is None:
+        acceptance = func_proba
     old_score = state.score
     if node_method:
-        state.random_node_action()
+        delta = state.random_node_action()
     else:
-        state.random_edge_action()
+        delta = state.random_edge_action()
     new_score = state.score
-    proba = func_proba(state, new_score, old_score)
-    # proba = func_sigmoid_proba(state, new_score, old_score)
-    if random.uniform(0, 1) < proba:
-        return state
+    proba = acceptance(state, new_score, old_score)
+    if random.uniform(0, 1) >= proba:
+        # rejected, undo the move in place
+        state.revert(delta)
+        return state, False
+    return state, True
+
+
+def batch_optimize(state: State, size: int, rng):
+    """
+    Draw size edge flips, keep the first one accepted by func_proba
+    the lower bounds of the changes of score (State.edge_flip_bounds) are tested first in one numpy operation,
+    only the flips which pass with their bound are done and tested with their true score,
+    with the same random number, so a flip is kept with the same probability as in optimize
+    return the state and True if a flip is kept
+    """
+    edge_ids = state.random_edge_flips(rng, size)
+    bounds = state.edge_flip_bounds(edge_ids)
+    draws = rng.random(size)
+    if state.temperature > 0.0:
+        passed = (bounds <= 0) | (draws < np.exp(-np.maximum(bounds, 0) / state.temperature))
     else:
-        return State(state.graph, state.terms, old_sol, state.temperature, state.speed)
+        passed = bounds <= 0
+    old_score = state.score
+    for k in np.flatnonzero(passed).tolist():
+        delta = state.flip_edge_id(int(edge_ids[k]))
+        if draws[k] < func_proba(state, state.score, old_score):
+            return state, True
+        # rejected, undo the flip in place
+        state.revert(delta)
+    return state, False
 
 
 def func_proba(state, new_score, old_score):
@@ -61,12 +183,83 @@ def func_proba(state, new_score, old_score):
 
 
 def func_sigmoid_proba(state, new_score, old_score):
+    # at the end of the cooling, like func_proba
+    if state.temperature <= 0.0:
+        return 1.0 if old_score >= new_score else 0.0
     # let coefficient change with temperature
     coefficient = 1.0/state.temperature
     # in case the coefficient is too big
     if coefficient > 1:
         coefficient = 1
-    return 1.0 / (1.0 + math.exp(coefficient * (new_score - old_score)))
+    # in case the exponential overflows
+    exponent = min(max(coefficient * (new_score - old_score), -700.0), 700.0)
+    return 1.0 / (1.0 + math.exp(exponent))
+
+
+# graph, terms and initial solution of a worker process, shipped once by the pool initializer
+_worker_graph = None
+_worker_terms = None
+_worker_sol = None
+
+
+def _init_worker(graph, terms, sol=None):
+    global _worker_graph, _worker_terms, _worker_sol
+    _worker_graph = graph
+    _worker_terms = terms
+    _worker_sol = sol
+
+
+def _run_chain(seed, times, node_method, temperature, speed, schedule=None, patience=None, batch=None):
+    """
+    run one annealing chain on the graph of the worker process, from its initial solution
+    return the selected edges, the score, the final temperature and the trajectory of the chain
+    """
+    random.seed(seed)
+    state = State(_worker_graph, _worker_terms, _worker_sol, temperature, speed)
+    state, points_x, points_y = annealing(state, times, node_method, schedule=schedule, patience=patience,
+                                         batch=None if node_method else batch)
+    return state.sol, state.score, state.temperature, points_x, points_y
+
+
+def annealing_multistart(graph, terms: [], n_chains: int, workers: int = None, times: int = 3000,
+                         node_method=None, sol: [] = None, temperature: float = 30.0, speed: float = 0.01,
+                         seed: int = None, schedule=None, patience: int = None, batch: int = None):
+    """
+    Run n_chains independent simulated annealing chains with different seeds in a process pool
+    graph: nx.Graph(), sent once to every worker process with terms and sol, the tasks only carry the seed
+        and the parameters of the chains
+    workers: number of processes, os.cpu_count() by default, 1 runs the chains in this process
+    node_method: True or False for all the chains, None alternates node and edge method
+    sol: the initial selected edges of every chain, all the edges by default
+    seed: seed of the first chain, the chain i uses seed + i
+    schedule, patience: see annealing(), every chain starts the schedule again
+    batch: batch proposals of the edge method chains, see annealing()
+    return the best state and the trajectory (points_x, points_y) of every chain
+    """
+    if sol is None:
+        sol = get_sol_list(graph)
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    if workers is None:
+        workers = os.cpu_count()
+    tasks = []
+    for i in range(n_chains):
+        chain_node_method = (i % 2 == 0) if node_method is None else node_method
+        tasks.append((seed + i, times, chain_node_method, temperature, speed, schedule, patience, batch))
+
+    if workers <= 1:
+        _init_worker(graph, terms, sol)
+        results = [_run_chain(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, n_chains), initializer=_init_worker,
+                                 initargs=(graph, terms, sol)) as executor:
+            results = list(executor.map(_run_chain, *zip(*tasks)))
+
+    # best of the n chains
+    best_sol, best_score, best_temperature, _, _ = min(results, key=lambda result: result[1])
+    best_state = State(graph, terms, best_sol, best_temperature, speed)
+    trajectories = [(points_x, points_y) for (_, _, _, points_x, points_y) in results]
+    return best_state, trajectories
 
 
 def get_sol_list(graph):
@@ -87,69 +280,27 @@ def get_selected_nodes(graph):
     return res
 
 
-# class used to read a steinlib instance
-class MySteinlibInstance(SteinlibInstance):
-    my_graph = nx.Graph()
-    terms = []
-
-    def terminals__t(self, line, converted_token):
-        self.terms.append(converted_token[0])
-
-    def graph__e(self, line, converted_token):
-        e_start = converted_token[0]
-        e_end = converted_token[1]
-        weight = converted_token[2]
-        self.my_graph.add_edge(e_start, e_end, weight=weight)
-
-
 file_name = "b07"
 file = ".stp"
 stein_file = "data/B/" + file_name + file
 
 if __name__ == "__main__":
-    my_class = MySteinlibInstance()
-    with open(stein_file) as my_file:
-        # initialisation
-        my_parser = SteinlibParser(my_file, my_class)
-        my_parser.parse()
-        my_terms = my_class.terms
-        my_graph = my_class.my_graph
-        my_sol = get_sol_list(my_graph)
-
-        # execute simulated annealing algorithm
-        my_state1 = State(my_graph, my_terms, my_sol, temperature=30.0, speed=0.01)
-        final_state1, point_x1, point_y1 = annealing(my_state1, 3000)
-
-        # execute simulated annealing algorithm
-        my_state2 = State(my_graph, my_terms, my_sol, temperature=30.0, speed=0.01)
-        final_state2, point_x2, point_y2 = annealing(my_state2, 3000, False)
-
-        # # execute simulated annealing algorithm
-        # my_state3 = State(my_graph, my_terms, my_sol, temperature=30.0, speed=0.01)
-        # final_state3, point_x3, point_y3 = annealing(my_state3, 3000, False)
-        #
-        # # execute simulated annealing algorithm
-        # my_state4 = State(my_graph, my_terms, my_sol, temperature=30.0, speed=0.01)
-        # final_state4, point_x4, point_y4 = annealing(my_state4, 3000, False)
-
-        print("state with node method: " + str(final_state1))
-        print("state with edge method: " + str(final_state2))
-
-        # show the graph
-        plt.plot(point_x1, point_y1, color='r', label='with node method (result: ' + str(point_y1[len(point_y1)-1]) + ')')
-        plt.plot(point_x2, point_y2, color='b', label='with edge method (result: ' + str(point_y2[len(point_y2)-1]) + ')')
-        plt.xlabel("Number of evaluation times")
-        plt.ylabel("Weights total")
-        plt.title("Evaluation of two methods of algorithm simulated annealing " + str(file_name) +
-                  "\n using the sigmoid probability function"
-                  "\n(Tstart=30.0, speed=0.01)")
-        plt.legend()
-        plt.show()
-
-        # plt.plot(point_x1, point_y1, color='r', label='with node method')
-        # plt.plot(point_x1, point_y2, color='b', label='with edge method')
-        # plt.xlabel("Number of evaluation times")
-        # plt.ylabel("Weights total")
-        # plt.title("Evaluation of two methods of algorithm simulated annealing \n(Tstart=30.0, speed=0.01)")
-        # plt.legend()
-        # plt.show()
+    my_graph, my_terms = load_instance(stein_file)
+    my_sol = get_sol_list(my_graph)
+
+    # execute simulated annealing algorithm, one chain with node method and one with edge method
+    final_state, trajectories = annealing_multistart(my_graph, my_terms, n_chains=2, sol=my_sol,
+                                                     temperature=30.0, speed=0.01)
+    (point_x1, point_y1), (point_x2, point_y2) = trajectories
+
+    print("best state: " + str(final_state))
+    print("state with node method: " + str(point_y1[len(point_y1)-1]))
+    print("state with edge method: " + str(point_y2[len(point_y2)-1]))
+
+    # show the graph
+    from visualization import plot_trajectories
+    plot_trajectories([(point_x1, point_y1), (point_x2, point_y2)],
+                      labels=['with node method (result: ' + str(point_y1[len(point_y1)-1]) + ')',
+                              'with edge method (result: ' + str(point_y2[len(point_y2)-1]) + ')'],
+                      title="Evaluation of two methods of algorithm simulated annealing " + str(file_name) +
+                            "\n(Tstart=30.0, speed=0.01)")
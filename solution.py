@@ -0,0 +1,209 @@
+import random
+import weakref
+from array import array
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class IndexedGraph(object):
+    """
+    This class is a compact copy of a graph:
+    the nodes are relabeled 0..n-1 and every edge has an integer id 0..m-1
+    ATTENTION! the graph must not change after the IndexedGraph is built
+    """
+
+    def __init__(self, graph):
+        """
+        graph: nx.Graph()
+        """
+        self.labels = list(graph.nodes)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.edge_u = array('i')
+        self.edge_v = array('i')
+        self.edge_weight = []
+        self.incident = [[] for _ in self.labels]
+        self.edge_ids = {}
+        for (label_u, label_v, weight) in graph.edges(data='weight'):
+            u = self.index[label_u]
+            v = self.index[label_v]
+            edge_id = len(self.edge_weight)
+            self.edge_u.append(u)
+            self.edge_v.append(v)
+            self.edge_weight.append(weight)
+            self.incident[u].append(edge_id)
+            self.incident[v].append(edge_id)
+            self.edge_ids[(u, v)] = edge_id
+            self.edge_ids[(v, u)] = edge_id
+        # a CSRGraph has the same node indices, its matrix can be shared
+        self._matrix = getattr(graph, 'matrix', None)
+        self._arrays = None
+
+    def __repr__(self):
+        return "IndexedGraph(nodes: " + str(self.number_nodes) + ", edges: " + str(self.number_edges) + ")"
+
+    @property
+    def number_nodes(self):
+        return len(self.labels)
+
+    @property
+    def number_edges(self):
+        return len(self.edge_weight)
+
+    @property
+    def matrix(self):
+        """
+        symmetric scipy CSR matrix of the weights, indexed by node index, for scipy.sparse.csgraph
+        """
+        if self._matrix is None:
+            u, v, weight = self.arrays()
+            self._matrix = csr_matrix((np.concatenate([weight, weight]), (np.concatenate([u, v]), np.concatenate([v, u]))),
+                                      shape=(self.number_nodes, self.number_nodes))
+        return self._matrix
+
+    def arrays(self):
+        """
+        return the numpy arrays u, v and weight of the edges, indexed by edge id
+        """
+        if self._arrays is None:
+            self._arrays = (np.frombuffer(self.edge_u, dtype=np.int32), np.frombuffer(self.edge_v, dtype=np.int32),
+                            np.asarray(self.edge_weight))
+        return self._arrays
+
+    def edge_id(self, edge):
+        """
+        return the id of an edge given with the labels of its nodes, in any orientation
+        """
+        return self.edge_ids[(self.index[edge[0]], self.index[edge[1]])]
+
+    def edge_labels(self, edge_id: int):
+        """
+        return the edge as a tuple of the labels of its nodes
+        """
+        return self.labels[self.edge_u[edge_id]], self.labels[self.edge_v[edge_id]]
+
+    def other_end(self, edge_id: int, node: int):
+        """
+        return the other node of the edge
+        """
+        u = self.edge_u[edge_id]
+        return self.edge_v[edge_id] if u == node else u
+
+
+# one IndexedGraph per graph, shared by all the states of the graph
+_indexed_graphs = weakref.WeakKeyDictionary()
+
+
+def get_indexed_graph(graph):
+    """
+    return the shared IndexedGraph of the graph, create it if needed
+    """
+    indexed = _indexed_graphs.get(graph)
+    if indexed is None:
+        indexed = IndexedGraph(graph)
+        _indexed_graphs[graph] = indexed
+    return indexed
+
+
+class IndexedSet(object):
+    """
+    Set of integers 0..size-1 with O(1) add, remove, membership and random choice
+    """
+
+    def __init__(self, size: int, full: bool = False):
+        self.items = array('i', range(size)) if full else array('i')
+        self.position = array('i', range(size)) if full else array('i', [-1]) * size
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, item: int):
+        return self.position[item] >= 0
+
+    def add(self, item: int):
+        if self.position[item] < 0:
+            self.position[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item: int):
+        index = self.position[item]
+        if index >= 0:
+            # move the last item in the hole
+            last = self.items[-1]
+            self.items[index] = last
+            self.position[last] = index
+            self.items.pop()
+            self.position[item] = -1
+
+    def choice(self):
+        return self.items[random.randrange(len(self.items))]
+
+
+class Solution(object):
+    """
+    This class represents a set of selected edges of an IndexedGraph:
+    a bytearray of the selected edges, the degree of every node in the selection,
+    and indexed sets of the selected and unselected edges and nodes
+    """
+
+    def __init__(self, indexed: IndexedGraph):
+        self.indexed = indexed
+        self.selected = bytearray(indexed.number_edges)
+        self.degree = array('i', [0]) * indexed.number_nodes
+        self.selected_edges = IndexedSet(indexed.number_edges)
+        self.unselected_edges = IndexedSet(indexed.number_edges, full=True)
+        self.selected_nodes = IndexedSet(indexed.number_nodes)
+        self.unselected_nodes = IndexedSet(indexed.number_nodes, full=True)
+
+    def __len__(self):
+        return len(self.selected_edges)
+
+    def __contains__(self, edge_id: int):
+        return self.selected[edge_id] == 1
+
+    def add(self, edge_id: int) -> bool:
+        """
+        select the edge, return False if it was already selected
+        """
+        if self.selected[edge_id]:
+            return False
+        self.selected[edge_id] = 1
+        self.selected_edges.add(edge_id)
+        self.unselected_edges.remove(edge_id)
+        self._increase_degree(self.indexed.edge_u[edge_id])
+        self._increase_degree(self.indexed.edge_v[edge_id])
+        return True
+
+    def remove(self, edge_id: int) -> bool:
+        """
+        unselect the edge, return False if it was not selected
+        """
+        if not self.selected[edge_id]:
+            return False
+        self.selected[edge_id] = 0
+        self.selected_edges.remove(edge_id)
+        self.unselected_edges.add(edge_id)
+        self._decrease_degree(self.indexed.edge_u[edge_id])
+        self._decrease_degree(self.indexed.edge_v[edge_id])
+        return True
+
+    def selected_incident(self, node: int):
+        """
+        return the ids of the selected edges around the node
+        """
+        return [edge_id for edge_id in self.indexed.incident[node] if self.selected[edge_id]]
+
+    def _increase_degree(self, node: int):
+        self.degree[node] += 1
+        if self.degree[node] == 1:
+            self.selected_nodes.add(node)
+            self.unselected_nodes.remove(node)
+
+    def _decrease_degree(self, node: int):
+        self.degree[node] -= 1
+        if self.degree[node] == 0:
+            self.selected_nodes.remove(node)
+            self.unselected_nodes.add(node)
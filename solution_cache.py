@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+from approximation import APPROX_METHODS, approx_steiner, metric_closure
+from solution import get_indexed_graph
+
+# key of every (graph, terms) already hashed, per graph
+_instance_keys = weakref.WeakKeyDictionary()
+
+
+def instance_key(graph, terms: []):
+    """
+    return the sha256 of the edges (labels and weight, in any order and orientation) and of the terms of an instance
+    the same instance read again, from an other file or by an other loader, has the same key
+    """
+    keys = _instance_keys.setdefault(graph, {})
+    terms_key = tuple(terms)
+    if terms_key not in keys:
+        indexed = get_indexed_graph(graph)
+        labels = indexed.labels
+        digest = hashlib.sha256()
+        edges = sorted(tuple(sorted((repr(labels[indexed.edge_u[edge_id]]), repr(labels[indexed.edge_v[edge_id]]))))
+                       + (repr(indexed.edge_weight[edge_id]),) for edge_id in range(indexed.number_edges))
+        for edge in edges:
+            digest.update(" ".join(edge).encode() + b"\n")
+        digest.update(b"terms\n")
+        for node in sorted(repr(node) for node in terms):
+            digest.update(node.encode() + b"\n")
+        keys[terms_key] = digest.hexdigest()
+    return keys[terms_key]
+
+
+class SolutionCache(object):
+    """
+    This class is an on-disk cache of the results of an instance, keyed by instance_key:
+    the metric closure of the terminals (key.sorted_closure.npy), the approximation solutions and the best known
+    solution of the annealing (key.json)
+    the least recently used files are deleted when the directory is bigger than max_bytes
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2 ** 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self):
+        return "SolutionCache(" + self.directory + ")"
+
+    def closure(self, graph, terms: [], oracle=None):
+        """
+        return metric_closure(graph, terms), computed and stored if it is not in the cache
+        the key of the instance ignores the order of the terms, so the matrix is stored in the order
+        of the sorted terms and its rows and columns are put back in the order of terms
+        """
+        # rank of every term of terms in the sorted terms
+        order = sorted(range(len(terms)), key=lambda k: repr(terms[k]))
+        rank = np.empty(len(terms), dtype=np.intp)
+        rank[order] = np.arange(len(terms))
+        path = self._path(graph, terms, ".sorted_closure.npy")
+        try:
+            closure = np.load(path)
+            self._touch(path)
+            return closure[np.ix_(rank, rank)]
+        except (OSError, ValueError, IndexError):
+            pass
+        closure = metric_closure(graph, terms, oracle)
+        stored = closure[np.ix_(order, order)]
+        self._write(path, lambda my_file: np.save(my_file, stored))
+        return closure
+
+    def approx(self, graph, terms: [], method: str = "approx"):
+        """
+        return the solution of the approximation method (a name of APPROX_METHODS),
+        computed and stored if it is not in the cache
+        """
+        record = self._read(graph, terms)
+        solutions = record.setdefault("approx", {})
+        if method in solutions:
+            return [tuple(edge) for edge in solutions[method]]
+        if method == "approx":
+            sol = approx_steiner(graph, terms, closure=self.closure(graph, terms))
+        else:
+            sol = APPROX_METHODS[method](graph, terms)
+        solutions[method] = sol
+        self._save(graph, terms, record)
+        return sol
+
+    def best(self, graph, terms: []):
+        """
+        return the best known solution and its score, or (None, None)
+        """
+        best = self._read(graph, terms).get("best")
+        if best is None:
+            return None, None
+        return [tuple(edge) for edge in best["sol"]], best["score"]
+
+    def offer(self, graph, terms: [], sol: [], score) -> bool:
+        """
+        store sol as the best known solution if its score is better
+        return True if it is stored
+        """
+        record = self._read(graph, terms)
+        best = record.get("best")
+        if best is not None and best["score"] <= score:
+            return False
+        record["best"] = {"sol": [list(edge) for edge in sol], "score": score}
+        self._save(graph, terms, record)
+        return True
+
+    def _path(self, graph, terms: [], suffix: str):
+        return os.path.join(self.directory, instance_key(graph, terms) + suffix)
+
+    def _read(self, graph, terms: []):
+        path = self._path(graph, terms, ".json")
+        try:
+            with open(path) as my_file:
+                record = json.load(my_file)
+        except (OSError, ValueError):
+            return {}
+        self._touch(path)
+        return record
+
+    def _save(self, graph, terms: [], record: dict):
+        self._write(self._path(graph, terms, ".json"), lambda my_file: my_file.write(json.dumps(record).encode()))
+
+    def _write(self, path: str, write):
+        """
+        write a file of the cache with write(file), through a temporary file so a reader never sees half a file
+        """
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as my_file:
+                write(my_file)
+            os.replace(temporary, path)
+        except OSError:
+            # the cache is only an optimization
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            return
+        self._evict()
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _evict(self):
+        """
+        delete the least recently used files until the cache is not bigger than max_bytes
+        """
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for (_, size, _) in files)
+        for (_, size, path) in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -1,9 +1,13 @@
 import random
+import numpy as np
 import networkx as nx
-import matplotlib.pyplot as plt
-from heapq import nlargest
 
 import util
+from connectivity import Connectivity
+from local_search import local_search
+from postprocess import clean_solution
+from shortest_path import get_candidate_index, get_oracle
+from solution import IndexedSet, Solution, get_indexed_graph
 
 
 class State(object):
@@ -11,44 +15,74 @@ class State(object):
     This class represents the state of graph
     """
 
-    def __init__(self, graph, terms: [], sol: [], temperature: float, speed: float):
+    def __init__(self, graph, terms: [], sol: [], temperature: float, speed: float, oracle=None,
+                 incremental: bool = True):
         """
         graph: nx.Graph()
         terms: the nodes list we want to span (parcours)
         sol: the edges list to span terms. ATTENTION! it is equal to "selected edges"
         temperature: parameter of simulated annealing algorithm, amplitude to optimize
-        speed: parameter of simulated annealing algorithm, speed reduce temperature
+        speed: parameter of simulated annealing algorithm, speed of the default LinearSchedule
+        oracle: ShortestPathOracle of the graph, the shared one of the graph by default
+        incremental: keep the weight, the covered terminals and the components as running values,
+            otherwise the score rebuilds graph_sol at every call
         """
         self.graph = graph
+        self.oracle = oracle if oracle is not None else get_oracle(graph)
+        self.indexed = get_indexed_graph(graph)
+        self.candidates = get_candidate_index(graph, terms)
         self.terms = terms
-        self.sol = sol
         self.temperature = temperature
         self.speed = speed
+        self.incremental = incremental
+
+        # the selected edges, by id of the indexed graph
+        self.solution = Solution(self.indexed)
+        self._is_term = bytearray(self.indexed.number_nodes)
+        for node in terms:
+            self._is_term[self.indexed.index[node]] = 1
+        # the selected nodes which are not terminals
+        self._steiner_nodes = IndexedSet(self.indexed.number_nodes)
+
+        # running values of the score, updated by add_edge and remove_edge
+        self._weight = 0
+        self._covered = 0
+        self.connectivity = Connectivity(self.solution)
+
+        for edge in sol:
+            self.add_edge(edge)
 
     def __repr__(self):
         res = "score :" + str(self.score) + ", temperature: " + str(self.temperature)
         return res
 
+    @property
+    def sol(self):
+        """
+        the list of selected edges, with the labels of the graph
+        """
+        edge_labels = self.indexed.edge_labels
+        return [edge_labels(edge_id) for edge_id in self.solution.selected_edges]
+
     @property
     def selected_nodes(self):
-        res = []
-        for e in self.sol:
-            if e[0] not in res:
-                res.append(e[0])
-            if e[1] not in res:
-                res.append(e[1])
-        return res
+        labels = self.indexed.labels
+        return [labels[node] for node in self.solution.selected_nodes]
 
     @property
     def unselected_nodes(self):
-        return list(set(self.graph.nodes) - set(self.selected_nodes))
+        labels = self.indexed.labels
+        return [labels[node] for node in self.solution.unselected_nodes]
 
     @property
     def score(self):
         """
         Evaluation function for the graph state
         """
-        cost = self.graph_sol.size(weight='weight')
+        if self.incremental:
+            cost = self._weight
+        else:
+            cost = self.graph_sol.size(weight='weight')
         cost += self.number_not_covered_terminals * 100
         cost += self.number_components * 100
         return int(cost)
@@ -56,12 +90,17 @@ class State(object):
     @property
     def graph_sol(self):
         graph_sol = nx.Graph()
-        for (i, j) in self.sol:
-            graph_sol.add_edge(i, j, weight=self.graph[i][j]['weight'])
+        edge_labels = self.indexed.edge_labels
+        edge_weight = self.indexed.edge_weight
+        for edge_id in self.solution.selected_edges:
+            (i, j) = edge_labels(edge_id)
+            graph_sol.add_edge(i, j, weight=edge_weight[edge_id])
         return graph_sol
 
     @property
     def number_not_covered_terminals(self):
+        if self.incremental:
+            return len(self.terms) - self._covered
         number = 0
         for i in self.terms:
             if i not in self.graph_sol:
@@ -70,49 +109,173 @@ class State(object):
 
     @property
     def number_components(self):
+        if self.incremental:
+            return max(self.connectivity.number - 1, 0)
         number = 0
         number_components = nx.number_connected_components(self.graph_sol)
         for _ in range(number_components - 1):
             number = number + 1
         return number
 
+    def has_edge(self, edge) -> bool:
+        """
+        return True if the edge is selected, in any orientation
+        """
+        return self.indexed.edge_id(edge) in self.solution
+
+    def add_edge(self, edge) -> bool:
+        """
+        select the edge and update the running values of the score
+        return False if the edge was already selected
+        """
+        return self.add_edge_id(self.indexed.edge_id(edge))
+
+    def remove_edge(self, edge) -> bool:
+        """
+        unselect the edge and update the running values of the score
+        return False if the edge was not selected
+        """
+        return self.remove_edge_id(self.indexed.edge_id(edge))
+
+    def add_edge_id(self, edge_id: int) -> bool:
+        if not self.solution.add(edge_id):
+            return False
+        self._weight += self.indexed.edge_weight[edge_id]
+        u = self.indexed.edge_u[edge_id]
+        v = self.indexed.edge_v[edge_id]
+        self._node_selected(u)
+        self._node_selected(v)
+        self.connectivity.add_edge(u, v)
+        return True
+
+    def remove_edge_id(self, edge_id: int) -> bool:
+        if not self.solution.remove(edge_id):
+            return False
+        self._weight -= self.indexed.edge_weight[edge_id]
+        u = self.indexed.edge_u[edge_id]
+        v = self.indexed.edge_v[edge_id]
+        self._node_unselected(u)
+        self._node_unselected(v)
+        self.connectivity.remove_edge(u, v)
+        return True
+
+    def apply(self, delta: []):
+        """
+        apply a delta, the list of (edge id, added) returned by a move
+        """
+        for edge_id, added in delta:
+            if added:
+                self.add_edge_id(edge_id)
+            else:
+                self.remove_edge_id(edge_id)
+
+    def revert(self, delta: []):
+        """
+        undo a delta returned by a move, the state goes back to the one before the move
+        """
+        for edge_id, added in reversed(delta):
+            if added:
+                self.remove_edge_id(edge_id)
+            else:
+                self.add_edge_id(edge_id)
+
+    def snapshot(self) -> bytes:
+        """
+        return a copy of the selected edges, restore(snapshot) goes back to them
+        """
+        return bytes(self.solution.selected)
+
+    def restore(self, snapshot: bytes):
+        """
+        go back to the selected edges of a snapshot
+        return the delta done
+        """
+        then = np.frombuffer(snapshot, dtype=np.uint8)
+        changed = np.flatnonzero(np.frombuffer(self.solution.selected, dtype=np.uint8) != then)
+        delta = [(edge_id, bool(then[edge_id])) for edge_id in changed.tolist()]
+        self.apply(delta)
+        return delta
+
+    def clean(self):
+        """
+        replace the solution by postprocess.clean_solution of it: the minimum spanning tree
+        of the selected nodes without the leaves which are not terminals
+        return the delta, it can be reverted
+        """
+        cleaned = set(self.indexed.edge_id(edge) for edge in clean_solution(self.graph, self.terms, self.sol))
+        delta = [(edge_id, False) for edge_id in self.solution.selected_edges if edge_id not in cleaned]
+        delta += [(edge_id, True) for edge_id in cleaned if edge_id not in self.solution]
+        self.apply(delta)
+        return delta
+
+    def improve(self, max_rounds: int = 1000):
+        """
+        replace the solution by local_search.local_search of it: steiner vertex elimination and insertion
+        and key path exchange until none of them improves the tree
+        return the delta, it can be reverted
+        """
+        improved = set(self.indexed.edge_id(edge) for edge in local_search(self.graph, self.terms, self.sol, max_rounds))
+        delta = [(edge_id, False) for edge_id in self.solution.selected_edges if edge_id not in improved]
+        delta += [(edge_id, True) for edge_id in improved if edge_id not in self.solution]
+        self.apply(delta)
+        return delta
+
+    def _node_selected(self, node: int):
+        """
+        update the covered terminals after the degree of the node increased
+        """
+        if self.solution.degree[node] == 1:
+            if self._is_term[node]:
+                self._covered += 1
+            else:
+                self._steiner_nodes.add(node)
+
+    def _node_unselected(self, node: int):
+        """
+        update the covered terminals after the degree of the node decreased
+        """
+        if self.solution.degree[node] == 0:
+            if self._is_term[node]:
+                self._covered -= 1
+            else:
+                self._steiner_nodes.remove(node)
+
     def get_neighbor_edges(self, node: int):
         """
         return the neighbor list of the node
         """
-        neighbor_list = []
-        for edge in self.sol:
-            if node in edge:
-                neighbor_list.append(edge)
-        return neighbor_list
+        edge_labels = self.indexed.edge_labels
+        return [edge_labels(edge_id) for edge_id in self.solution.selected_incident(self.indexed.index[node])]
 
     def random_node_action(self):
         """
         do a random node action, delete a selected node, or add a unselected node
+        return the delta of the action
         """
         decision = random.randint(0, 1)
         if decision == 0:
-            self.delete_random_node()
+            delta = self.delete_random_node()
         else:
-            self.add_random_node()
-        if self.temperature > 0.0:
-            self.temperature = self.temperature - self.speed
+            delta = self.add_random_node()
+        return delta
 
     def delete_random_node(self):
-        # Fast delete method
-        selected_not_terms_nodes = list(set(self.selected_nodes) - set(self.terms))
+        delta = []
+        # Fast delete method, the selected nodes which are not terminals
+        selected_not_terms_nodes = self._steiner_nodes
 
         # Normal delete method
-        # selected_not_terms_nodes = self.selected_nodes
+        # selected_not_terms_nodes = self.solution.selected_nodes
 
         if len(selected_not_terms_nodes) > 0:
-            node_delete = random.choice(selected_not_terms_nodes)
-            neighbor_edges = self.get_neighbor_edges(node_delete)
-            for edge in neighbor_edges:
-                if edge in self.sol:
-                    self.sol.remove(edge)
+            node_delete = selected_not_terms_nodes.choice()
+            for edge_id in self.solution.selected_incident(node_delete):
+                self.remove_edge_id(edge_id)
+                delta.append((edge_id, False))
+        return delta
 
     def add_random_node(self):
+        delta = []
         # Fast add method, but we don't recommend using it
         # not_terms = list(set(self.graph.nodes) - set(self.terms))
         # unselected_terms_nodes = list(set(self.unselected_nodes) - set(list(set(self.graph.nodes) - set(self.terms))))
@@ -125,80 +288,127 @@ class State(object):
             list_path = self.get_closest_path_to_selected_node(node_add)
             list_path_to_add = util.split_list(list_path)
             for element in list_path_to_add:
-                if element not in self.sol:
-                    self.sol.append(element)
+                edge_id = self.indexed.edge_id(element)
+                if self.add_edge_id(edge_id):
+                    delta.append((edge_id, True))
+        return delta
 
     def get_closest_path(self, node1, node2):
         """
         get the closest path from node1 to node2
-        return list of edges
+        return list of nodes
         """
-        len_path = dict(nx.all_pairs_dijkstra(self.graph))
-        nodes_len_path = len_path[node1]
-        nodes_path = nodes_len_path[1]
-        path = nodes_path[node2]
-        return path
+        return self.oracle.path(node1, node2)
 
     def get_closest_path_to_selected_node(self, node):
         """
-        get the closest path from node to another selected node
-        return list of edges
-        """
-        len_path = dict(nx.all_pairs_dijkstra(self.graph))
-        nodes_len_path = len_path[node]
-        nodes_distance = 0
-        nodes_path = []
-        nodes_distance = nodes_len_path[0]
-        nodes_path = nodes_len_path[1]
-
-        # find the mini distance to other node
-        # min_distance = 100
-        # index1 = 1
-        # index2 = 1
-        # for node_index, node_distance in nodes_distance.items():
-        #     if min_distance > node_distance and node_index in self.selected_nodes:
-        #         min_distance = node_distance
-        #         index1 = node_index
-
-        n = 3
-        index_list = nlargest(n, nodes_distance, key=nodes_distance.get)
-        random_number = random.randint(0, n - 1)
-        index = index_list[random_number]
-        return self.get_closest_path(node, index)
+        get the closest path from the terminal node to the solution:
+        to the nearest selected node if node is not selected,
+        to the nearest selected node of another component if node is selected,
+        to the nearest terminal if nothing is selected
+        return list of nodes, empty if there is no such path
+        """
+        node_index = self.indexed.index[node]
+        degree = self.solution.degree
+        if len(self.solution.selected_nodes) == 0:
+            path = self.candidates.nearest(node_index, self._is_term.__getitem__)
+        elif degree[node_index] == 0:
+            path = self.candidates.nearest(node_index, degree.__getitem__)
+        else:
+            connected = self.connectivity.connected
+            path = self.candidates.nearest(node_index, lambda other: degree[other] > 0 and
+                                           not connected(node_index, other))
+        if path is None:
+            return []
+        labels = self.indexed.labels
+        return [labels[i] for i in path]
 
     def random_edge_action(self):
         """
         do a random edge action, delete a selected edge or add an unselected edge
+        return the delta of the action
         """
         decision = random.randint(0, 1)
         if decision == 0:
-            self.delete_random_sol()
+            delta = self.delete_random_sol()
         else:
-            self.add_random_sol()
-        if self.temperature > 0.0:
-            self.temperature = self.temperature - self.speed
+            delta = self.add_random_sol()
+        return delta
 
     def delete_random_sol(self):
-        if len(self.sol) > 0:
-            edge_delete = random.choice(self.sol)
-            self.sol.remove(edge_delete)
+        if len(self.solution.selected_edges) > 0:
+            edge_delete = self.solution.selected_edges.choice()
+            self.remove_edge_id(edge_delete)
+            return [(edge_delete, False)]
+        return []
 
     def add_random_sol(self):
-        if len(self.graph.edges) > len(self.sol):
-            not_selected_edges = list(set(self.graph.edges) - set(self.sol))
-            edge_add = random.choice(not_selected_edges)
-            if edge_add not in self.sol:
-                self.sol.append(edge_add)
-
-    def print_graph(self):
-        """
-        print the graphic state
-        """
-        pos = nx.kamada_kawai_layout(self.graph)
-        nx.draw(self.graph, pos, with_labels=True)
-        if not (self.terms is None):
-            nx.draw_networkx_nodes(self.graph, pos, nodelist=self.terms, node_color='r')
-        if not (self.sol is None):
-            nx.draw_networkx_edges(self.graph, pos, edgelist=self.sol, edge_color='r')
-        plt.show()
-        return
+        if len(self.solution.unselected_edges) > 0:
+            edge_add = self.solution.unselected_edges.choice()
+            self.add_edge_id(edge_add)
+            return [(edge_add, True)]
+        return []
+
+    def random_edge_flips(self, rng, size: int):
+        """
+        draw size edge flips like random_edge_action: a selected edge to delete or an unselected edge to add
+        rng: numpy random Generator
+        return the array of the edge ids, a selected edge is a deletion and an unselected one an addition
+        """
+        selected = self.solution.selected_edges.items
+        unselected = self.solution.unselected_edges.items
+        if len(selected) == 0 or len(unselected) == 0:
+            items = selected if len(selected) > 0 else unselected
+            return np.frombuffer(items, dtype=np.int32)[rng.integers(0, len(items), size)]
+        delete = rng.integers(0, 2, size) == 0
+        edge_ids = np.frombuffer(unselected, dtype=np.int32)[rng.integers(0, len(unselected), size)]
+        edge_ids[delete] = np.frombuffer(selected, dtype=np.int32)[rng.integers(0, len(selected), delete.sum())]
+        return edge_ids
+
+    def edge_flip_bounds(self, edge_ids):
+        """
+        lower bounds of the change of the score for flipping every edge of edge_ids alone, in one numpy operation
+        the weight and the covered terminals are exact, only the merge of two components by an addition
+        and the split of a component by a deletion need a search: the bound takes the merge and not the split
+        """
+        u, v, weight = self.indexed.arrays()
+        selected = np.frombuffer(self.solution.selected, dtype=np.uint8)[edge_ids].astype(bool)
+        degree = np.frombuffer(self.solution.degree, dtype=np.int32)
+        is_term = np.frombuffer(self._is_term, dtype=np.uint8)
+        degree_u = degree[u[edge_ids]]
+        degree_v = degree[v[edge_ids]]
+        term_u = is_term[u[edge_ids]].astype(np.int64)
+        term_v = is_term[v[edge_ids]].astype(np.int64)
+        number = self.connectivity.number
+
+        bounds = np.where(selected, -weight[edge_ids], weight[edge_ids]).astype(np.float64)
+        # covered terminals
+        bounds += 100 * np.where(selected, term_u * (degree_u == 1) + term_v * (degree_v == 1),
+                                 -term_u * (degree_u == 0) - term_v * (degree_v == 0))
+        # components, a new one for an edge between two unselected nodes, a merge (maybe) between two selected nodes,
+        # a deleted edge between two leaves is a component which disappears
+        added_new = ~selected & (degree_u == 0) & (degree_v == 0)
+        added_merge = ~selected & (degree_u > 0) & (degree_v > 0)
+        deleted_alone = selected & (degree_u == 1) & (degree_v == 1)
+        bounds += 100 * added_new * (number >= 1)
+        bounds -= 100 * added_merge * (number >= 2)
+        bounds -= 100 * deleted_alone * (number >= 2)
+        return bounds
+
+    def flip_edge_id(self, edge_id: int):
+        """
+        delete the edge if it is selected, add it otherwise
+        return the delta of the flip
+        """
+        if self.solution.selected[edge_id]:
+            self.remove_edge_id(edge_id)
+            return [(edge_id, False)]
+        self.add_edge_id(edge_id)
+        return [(edge_id, True)]
+
+    def print_graph(self, path: str = None):
+        """
+        print the graphic state, in the file path if it is given (see visualization.draw_solution)
+        """
+        from visualization import draw_solution
+        draw_solution(self.graph, self.terms, self.sol, path)
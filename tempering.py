@@ -0,0 +1,171 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+
+import simulated_annealing
+from simulated_annealing import batch_optimize, func_proba, get_sol_list, optimize
+from state import State
+
+
+def temperature_ladder(low: float, high: float, number: int):
+    """
+    return number temperatures from low to high in geometric progression
+    low and high are positive, high is above low if there are two temperatures at least
+    """
+    if low <= 0.0 or (number > 1 and high <= low):
+        raise ValueError("a ladder needs 0 < low < high, not " + str(low) + " and " + str(high))
+    if number == 1:
+        return [low]
+    ratio = (high / low) ** (1.0 / (number - 1))
+    return [low * ratio ** k for k in range(number)]
+
+
+def swap_proba(cold_temperature: float, hot_temperature: float, cold_score, hot_score):
+    """
+    The probability to swap the configurations of two replicas
+    min(1, exp((cold_score - hot_score) * (1 / cold_temperature - 1 / hot_temperature))) is func_proba
+    of the move from cold_score to hot_score at the temperature 1 / (1 / cold_temperature - 1 / hot_temperature)
+    two replicas at the same temperature always swap
+    """
+    if cold_temperature == hot_temperature:
+        return 1.0
+    temperature = 1.0 / (1.0 / cold_temperature - 1.0 / hot_temperature)
+    return func_proba(SimpleNamespace(temperature=temperature), hot_score, cold_score)
+
+
+def _sweep(state: State, steps: int, node_method, batch: int):
+    """
+    run steps moves of one replica at its fixed temperature
+    return the best score met during the sweep (the start included) and the snapshot of its configuration
+    """
+    rng = np.random.default_rng(random.getrandbits(64)) if batch is not None else None
+    best_score = state.score
+    best_snapshot = state.snapshot()
+    for _ in range(steps):
+        if batch is not None:
+            batch_optimize(state, batch, rng)
+        else:
+            optimize(state, node_method)
+        if state.score < best_score:
+            best_score = state.score
+            best_snapshot = state.snapshot()
+    return best_score, best_snapshot
+
+
+def _snapshot_sol(state: State, snapshot: bytes):
+    """
+    return the selected edges of a snapshot of the state, the state is left as it is
+    """
+    delta = state.restore(snapshot)
+    sol = state.sol
+    state.revert(delta)
+    return sol
+
+
+def _run_replica(seed, sol, temperature, steps, node_method, batch):
+    """
+    run a sweep of one replica on the graph of the worker process (simulated_annealing._init_worker)
+    return the selected edges and the score of the replica, and the best ones met during the sweep
+    """
+    random.seed(seed)
+    state = State(simulated_annealing._worker_graph, simulated_annealing._worker_terms, sol, temperature, 0.0)
+    best_score, best_snapshot = _sweep(state, steps, node_method, batch)
+    return state.sol, state.score, _snapshot_sol(state, best_snapshot), best_score
+
+
+def parallel_tempering(graph, terms: [], temperatures: [], sweeps: int = 100, steps: int = 100, node_method=True,
+                       sol: [] = None, workers: int = 1, seed: int = None, batch: int = None):
+    """
+    Replica exchange: one State per temperature, every replica keeps its temperature,
+    after every sweep of steps moves the configurations of two neighbor temperatures are swapped
+    with the probability swap_proba (the even pairs after the even sweeps, the odd pairs after the odd ones)
+    temperatures: increasing temperatures of the replicas, e.g. temperature_ladder(1.0, 30.0, 8)
+    sol: the initial selected edges of every replica, all the edges by default
+    workers: number of processes, 1 runs the replicas in this process, the graph is sent once to every process
+        and the replicas are sent as their selected edges after every sweep
+    seed: seed of the moves of the replicas and of the swaps, a run is reproducible with the same seed and
+        the same choice of workers = 1 or not: a replica rebuilt from its selected edges in a worker process
+        draws its moves in an other order than the same replica kept in this process, so the two runs differ
+    batch: batch proposals of the edge method, see annealing()
+    return the best state met by a replica, during a sweep included, and the statistics: the attempted
+    and accepted swaps of every pair of neighbors, their acceptance rate and the best score after every sweep
+    """
+    if len(temperatures) == 0 or temperatures[0] <= 0.0 or \
+            any(hot <= cold for cold, hot in zip(temperatures, temperatures[1:])):
+        raise ValueError("the temperatures must be positive and strictly increasing: " + str(list(temperatures)))
+    if sol is None:
+        sol = get_sol_list(graph)
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    if workers is None:
+        workers = os.cpu_count()
+    swap_random = random.Random(seed)
+    number = len(temperatures)
+    batch = None if node_method else batch
+
+    attempts = [0] * (number - 1)
+    accepts = [0] * (number - 1)
+    best_scores = []
+    best_sol = list(sol)
+    best_score = None
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=min(workers, number),
+                                       initializer=simulated_annealing._init_worker, initargs=(graph, terms))
+        # the configuration and the score of the replica of every temperature
+        replicas = [(list(sol), None) for _ in temperatures]
+    else:
+        states = [State(graph, terms, sol, temperature, 0.0) for temperature in temperatures]
+    try:
+        for sweep in range(sweeps):
+            seeds = [seed + 1 + sweep * number + k for k in range(number)]
+            if executor is not None:
+                results = list(executor.map(_run_replica, seeds, [replica_sol for (replica_sol, _) in replicas],
+                                            temperatures, [steps] * number, [node_method] * number,
+                                            [batch] * number))
+                replicas = [(replica_sol, score) for (replica_sol, score, _, _) in results]
+                sweep_bests = [(sweep_score, sweep_sol) for (_, _, sweep_sol, sweep_score) in results]
+            else:
+                sweep_bests = []
+                for k, state in enumerate(states):
+                    random.seed(seeds[k])
+                    sweep_bests.append(_sweep(state, steps, node_method, batch))
+                replicas = [(None, state.score) for state in states]
+
+            # best of the sweep, the configurations met during the moves included
+            k_best = min(range(number), key=lambda k: sweep_bests[k][0])
+            if best_score is None or sweep_bests[k_best][0] < best_score:
+                best_score = sweep_bests[k_best][0]
+                if executor is not None:
+                    best_sol = sweep_bests[k_best][1]
+                else:
+                    best_sol = _snapshot_sol(states[k_best], sweep_bests[k_best][1])
+            best_scores.append(best_score)
+
+            # swaps between neighbor temperatures
+            for k in range(sweep % 2, number - 1, 2):
+                attempts[k] += 1
+                proba = swap_proba(temperatures[k], temperatures[k + 1], replicas[k][1], replicas[k + 1][1])
+                if swap_random.uniform(0, 1) < proba:
+                    accepts[k] += 1
+                    replicas[k], replicas[k + 1] = replicas[k + 1], replicas[k]
+                    if executor is None:
+                        states[k], states[k + 1] = states[k + 1], states[k]
+                        states[k].temperature = temperatures[k]
+                        states[k + 1].temperature = temperatures[k + 1]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    best_state = State(graph, terms, best_sol, temperatures[0], 0.0)
+    statistics = {
+        "swap_attempts": attempts,
+        "swap_accepts": accepts,
+        "swap_rates": [accepts[k] / attempts[k] if attempts[k] > 0 else 0.0 for k in range(number - 1)],
+        "best_scores": best_scores,
+    }
+    return best_state, statistics
@@ -0,0 +1,23 @@
+import os
+import random
+import sys
+
+import networkx as nx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_instance(seed: int, nodes: int, edges: int, number_terms: int):
+    """
+    return a connected nx.Graph() with integer weights and a list of terms
+    """
+    rng = random.Random(seed)
+    graph = nx.gnm_random_graph(nodes, edges, seed=seed)
+    # chain the components so the graph is connected
+    components = [sorted(component) for component in nx.connected_components(graph)]
+    for first, second in zip(components, components[1:]):
+        graph.add_edge(first[0], second[0])
+    for (u, v) in graph.edges:
+        graph[u][v]['weight'] = rng.randint(1, 10)
+    terms = rng.sample(sorted(graph.nodes), number_terms)
+    return graph, terms
@@ -0,0 +1,19 @@
+from types import SimpleNamespace
+
+import pytest
+
+from simulated_annealing import func_proba, func_sigmoid_proba
+
+
+@pytest.mark.parametrize("acceptance", [func_proba, func_sigmoid_proba])
+@pytest.mark.parametrize("temperature", [0.0, -1e-12])
+def test_acceptance_after_the_cooling(acceptance, temperature):
+    state = SimpleNamespace(temperature=temperature)
+    assert acceptance(state, 10, 12) == 1.0
+    assert acceptance(state, 12, 10) == 0.0
+
+
+def test_sigmoid_does_not_overflow():
+    state = SimpleNamespace(temperature=0.5)
+    assert func_sigmoid_proba(state, 10 ** 6, 0) < 1e-300
+    assert func_sigmoid_proba(state, 0, 10 ** 6) == 1.0
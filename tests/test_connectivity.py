@@ -0,0 +1,49 @@
+import random
+
+import networkx as nx
+import pytest
+
+from conftest import random_instance
+from state import State
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_components_follow_the_moves(seed):
+    graph, terms = random_instance(seed, 30, 60, 6)
+    state = State(graph, terms, list(graph.edges), 30.0, 0.01)
+    random.seed(seed)
+    for k in range(600):
+        delta = state.random_node_action() if k % 2 else state.random_edge_action()
+        if k % 3 == 0:
+            state.revert(delta)
+        assert state.connectivity.number == nx.number_connected_components(state.graph_sol)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_score_is_the_full_score(seed):
+    graph, terms = random_instance(seed, 25, 50, 5)
+    state = State(graph, terms, [], 30.0, 0.01)
+    random.seed(seed)
+    for k in range(400):
+        state.random_node_action() if k % 2 else state.random_edge_action()
+        score = state.score
+        state.incremental = False
+        assert state.score == score
+        state.incremental = True
+
+
+def test_revert_and_restore():
+    graph, terms = random_instance(0, 30, 60, 6)
+    state = State(graph, terms, list(graph.edges), 30.0, 0.01)
+    random.seed(0)
+    snapshot = state.snapshot()
+    score = state.score
+    for k in range(300):
+        before = (state.score, sorted(state.solution.selected_edges))
+        delta = state.random_node_action() if k % 2 else state.random_edge_action()
+        state.revert(delta)
+        assert (state.score, sorted(state.solution.selected_edges)) == before
+        state.apply(delta)
+    state.restore(snapshot)
+    assert state.score == score
+    assert state.connectivity.number == nx.number_connected_components(state.graph_sol)
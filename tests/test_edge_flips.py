@@ -0,0 +1,24 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import random_instance
+from state import State
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bounds_never_exceed_the_change_of_score(seed):
+    graph, terms = random_instance(seed, 30, 60, 6)
+    state = State(graph, terms, list(graph.edges), 30.0, 0.01)
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    for k in range(100):
+        state.random_node_action() if k % 2 else state.random_edge_action()
+        edge_ids = state.random_edge_flips(rng, 16)
+        bounds = state.edge_flip_bounds(edge_ids)
+        old_score = state.score
+        for edge_id, bound in zip(edge_ids.tolist(), bounds.tolist()):
+            delta = state.flip_edge_id(edge_id)
+            assert bound <= state.score - old_score
+            state.revert(delta)
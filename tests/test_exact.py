@@ -0,0 +1,43 @@
+import itertools
+
+import networkx as nx
+import pytest
+
+from approximation import approx_steiner
+from conftest import random_instance
+from exact import dreyfus_wagner
+
+
+def brute_force_cost(graph, terms: []):
+    """
+    return the optimal cost: the cheapest minimum spanning tree of a connected induced subgraph
+    which contains the terms, over all the sets of steiner nodes
+    """
+    others = [node for node in graph.nodes if node not in terms]
+    best = float('inf')
+    for size in range(len(others) + 1):
+        for steiner_nodes in itertools.combinations(others, size):
+            subgraph = graph.subgraph(list(terms) + list(steiner_nodes))
+            if nx.is_connected(subgraph):
+                best = min(best, nx.minimum_spanning_tree(subgraph).size(weight='weight'))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_dreyfus_wagner_is_optimal(seed):
+    graph, terms = random_instance(seed, 11, 22, 2 + seed % 4)
+    sol = dreyfus_wagner(graph, terms)
+    tree = nx.Graph()
+    tree.add_nodes_from(terms)
+    tree.add_edges_from(sol)
+    assert nx.is_connected(tree)
+    assert all(graph.has_edge(u, v) for (u, v) in sol)
+    assert sum(graph[u][v]['weight'] for (u, v) in sol) == brute_force_cost(graph, terms)
+
+
+def test_dreyfus_wagner_fallback():
+    graph, terms = random_instance(0, 11, 22, 4)
+    with pytest.raises(ValueError):
+        dreyfus_wagner(graph, terms, max_work=1)
+    assert sorted(dreyfus_wagner(graph, terms, max_work=1, fallback=approx_steiner)) == \
+        sorted(approx_steiner(graph, terms))
@@ -0,0 +1,33 @@
+import gc
+import weakref
+
+from approximation import approx_steiner
+from conftest import random_instance
+from loader import load_csr
+from shortest_path import _candidates, _oracles
+from state import State
+
+
+def test_graph_is_freed_with_its_oracle_and_candidates():
+    graph, terms = random_instance(0, 30, 60, 6)
+    state = State(graph, terms, approx_steiner(graph, terms), 30.0, 0.01)
+    state.random_node_action()
+    reference = weakref.ref(graph)
+    assert reference() in _oracles and reference() in _candidates
+    del graph, state
+    gc.collect()
+    assert reference() is None
+
+
+def test_csr_graph_is_freed(tmp_path):
+    stein_file = tmp_path / "small.stp"
+    stein_file.write_text("SECTION Graph\nE 1 2 3\nE 2 3 4\nE 1 3 9\nEND\n"
+                          "SECTION Terminals\nT 1\nT 3\nEND\nEOF\n")
+    graph, terms = load_csr(str(stein_file), use_cache=False)
+    approx_steiner(graph, terms)
+    reference = weakref.ref(graph)
+    number = len(_oracles)
+    del graph
+    gc.collect()
+    assert reference() is None
+    assert len(_oracles) == number - 1
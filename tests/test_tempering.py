@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import random_instance
+from tempering import parallel_tempering, swap_proba, temperature_ladder
+
+
+def test_ladder():
+    ladder = temperature_ladder(1.0, 8.0, 4)
+    assert ladder == pytest.approx([1.0, 2.0, 4.0, 8.0])
+    for low, high in [(0.0, 5.0), (5.0, 5.0), (5.0, 1.0)]:
+        with pytest.raises(ValueError):
+            temperature_ladder(low, high, 3)
+
+
+def test_swap_proba():
+    assert swap_proba(1.0, 2.0, 12, 10) == 1.0
+    assert 0.0 < swap_proba(1.0, 2.0, 10, 12) < 1.0
+    assert swap_proba(5.0, 5.0, 10, 12) == 1.0
+
+
+@pytest.mark.parametrize("temperatures", [[5.0, 5.0, 5.0], [4.0, 2.0, 1.0], [0.0, 1.0], []])
+def test_parallel_tempering_rejects_a_bad_ladder(temperatures):
+    graph, terms = random_instance(0, 20, 40, 4)
+    with pytest.raises(ValueError):
+        parallel_tempering(graph, terms, temperatures, sweeps=1, steps=1)
+
+
+def test_parallel_tempering_best_score():
+    graph, terms = random_instance(1, 20, 40, 4)
+    state, statistics = parallel_tempering(graph, terms, temperature_ladder(0.5, 20.0, 4), sweeps=10, steps=50,
+                                           seed=1)
+    assert state.score == statistics["best_scores"][-1] == min(statistics["best_scores"])
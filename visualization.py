@@ -0,0 +1,100 @@
+import os
+import sys
+import weakref
+
+import networkx as nx
+import numpy as np
+
+# the layout of every graph already drawn, label -> (x, y)
+_layouts = weakref.WeakKeyDictionary()
+
+# above this number of nodes the O(V^2) kamada kawai layout is replaced by the spring layout
+KAMADA_KAWAI_MAX_NODES = 200
+
+
+def _pyplot(headless: bool):
+    """
+    import matplotlib.pyplot only when something is drawn,
+    with the non-interactive Agg backend if headless or if there is no display
+    """
+    import matplotlib
+    if headless or (sys.platform.startswith("linux") and not os.environ.get("DISPLAY")
+                    and not os.environ.get("WAYLAND_DISPLAY")):
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def get_layout(graph, cache_dir: str = None):
+    """
+    return the positions of the nodes of the graph, computed once per graph
+    cache_dir: directory where the layout of the instance is also kept between the runs
+    """
+    layout = _layouts.get(graph)
+    if layout is not None:
+        return layout
+    nx_graph = graph if isinstance(graph, nx.Graph) else graph.to_networkx()
+    path = None
+    if cache_dir is not None:
+        from solution_cache import instance_key
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, instance_key(graph, []) + ".layout.npy")
+        if os.path.exists(path):
+            positions = np.load(path)
+            layout = {node: positions[k] for k, node in enumerate(nx_graph.nodes)}
+    if layout is None:
+        if nx_graph.number_of_nodes() <= KAMADA_KAWAI_MAX_NODES:
+            layout = nx.kamada_kawai_layout(nx_graph)
+        else:
+            layout = nx.spring_layout(nx_graph, seed=0)
+        if path is not None:
+            np.save(path, np.array([layout[node] for node in nx_graph.nodes]))
+    _layouts[graph] = layout
+    return layout
+
+
+def draw_solution(graph, terms: [] = None, sol: [] = None, path: str = None, title: str = None, index: int = 1,
+                  cache_dir: str = None):
+    """
+    draw the graph, the terminals in red and the edges of the solution in red
+    path: the image is written to this file (png, svg, pdf, ...), without a window, otherwise it is shown
+    """
+    plt = _pyplot(path is not None)
+    nx_graph = graph if isinstance(graph, nx.Graph) else graph.to_networkx()
+    pos = get_layout(graph, cache_dir)
+    plt.figure(index)
+    nx.draw(nx_graph, pos, with_labels=True)
+    if terms is not None:
+        nx.draw_networkx_nodes(nx_graph, pos, nodelist=terms, node_color='r')
+    if sol is not None:
+        nx.draw_networkx_edges(nx_graph, pos, edgelist=sol, edge_color='r')
+    if title is not None:
+        plt.title(title)
+    _show_or_save(plt, path)
+
+
+def plot_trajectories(trajectories: [], labels: [] = None, path: str = None, title: str = None):
+    """
+    plot the score of annealing trajectories, a list of (points_x, points_y)
+    path: the image is written to this file, otherwise it is shown
+    """
+    plt = _pyplot(path is not None)
+    plt.figure()
+    for k, (points_x, points_y) in enumerate(trajectories):
+        label = labels[k] if labels is not None else None
+        plt.plot(points_x, points_y, label=label)
+    plt.xlabel("Number of evaluation times")
+    plt.ylabel("Weights total")
+    if title is not None:
+        plt.title(title)
+    if labels is not None:
+        plt.legend()
+    _show_or_save(plt, path)
+
+
+def _show_or_save(plt, path: str):
+    if path is None:
+        plt.show()
+    else:
+        plt.savefig(path)
+        plt.close()